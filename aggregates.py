@@ -0,0 +1,245 @@
+"""
+Monthly aggregates for the CommunityFinances App reports.
+
+FinanceAggregate walks the incomes and the expenses worksheets once each
+and keeps, for every month found, whether there is data, the totals, the
+expenses per category and the rows whose amount could not be read. A
+monthly report is then a dictionary lookup instead of several scans.
+All amounts are summed as integer cents (see amounts.py). The summary
+of several months (year to date, a month range) is the combination of
+their MonthSummary objects, so it needs no further scan.
+
+Each summary also keeps the distribution of the amounts (of the incomes,
+and of the expenses of each category) in QuantileSketch objects (see
+sketches.py), so the median and the 90th percentile are read from a few
+hundred kept amounts at most, and combine like the totals.
+
+The aggregate is also an index kept up to date incrementally: rows
+stored by the session are added with add_income_rows/add_expense_rows,
+and is_stale() compares the number of rows it has seen with the current
+worksheet snapshots, so a rebuild only happens when the sheet changed
+some other way (e.g. rows entered by another session).
+"""
+from datetime import datetime
+import json
+
+from amounts import parse_stored_amount_cents, read_cents
+from schema import MONTH_NAMES
+from sketches import QuantileSketch
+
+# Column positions of each worksheet
+INCOME_AMOUNT_COLUMN = 2
+INCOME_CENTS_COLUMN = 3
+EXPENSE_CATEGORY_COLUMN = 1
+EXPENSE_AMOUNT_COLUMN = 3
+EXPENSE_CENTS_COLUMN = 4
+
+
+def row_amount_cents(row, amount_column, cents_column):
+    """
+    Returns the amount of a row in cents: from its amount_cents cell, or
+    parsed from the display amount for rows stored before that column
+    existed (not backfilled yet).
+    """
+    if len(row) > cents_column and row[cents_column] not in ("", None):
+        return read_cents(row[cents_column])
+    return parse_stored_amount_cents(row[amount_column])
+
+
+def months_between(first_month, last_month):
+    """
+    Returns the lowercase names of the months from first_month to
+    last_month (any case), both included.
+    """
+    first = MONTH_NAMES.index(first_month.lower())
+    last = MONTH_NAMES.index(last_month.lower())
+    return MONTH_NAMES[first:last + 1]
+
+
+class MonthSummary:
+    """Aggregated incomes and expenses of one month."""
+
+    def __init__(self):
+        self.has_income = False
+        self.has_expenses = False
+        self.total_income_cents = 0
+        self.total_expenses_cents = 0
+        # Category -> total expenses in cents
+        self.expenses_by_category = {}
+        # Rows found for the month whose amount is not a number
+        self.invalid_rows = []
+        # Distribution of the income amounts, in cents
+        self.income_sketch = QuantileSketch()
+        # Category -> distribution of its expense amounts, in cents
+        self.expense_sketches = {}
+
+    @property
+    def balance_cents(self):
+        """Net financial balance in cents: total income - total expenses."""
+        return self.total_income_cents - self.total_expenses_cents
+
+    def max_expense_category(self):
+        """
+        Finds the category with the maximum expense.
+        Returns (None, None) if there are no expenses.
+        """
+        if not self.expenses_by_category:
+            return None, None
+        max_category = max(
+            self.expenses_by_category, key=self.expenses_by_category.get)
+        return max_category, self.expenses_by_category[max_category]
+
+    @classmethod
+    def combined(cls, summaries):
+        """Returns the summary of several months together."""
+        total = cls()
+        for summary in summaries:
+            total.has_income = total.has_income or summary.has_income
+            total.has_expenses = total.has_expenses or summary.has_expenses
+            total.total_income_cents += summary.total_income_cents
+            total.total_expenses_cents += summary.total_expenses_cents
+            by_category = total.expenses_by_category
+            for category, cents in summary.expenses_by_category.items():
+                by_category[category] = by_category.get(category, 0) + cents
+            total.invalid_rows.extend(summary.invalid_rows)
+            total.income_sketch.merge(summary.income_sketch)
+            for category, sketch in summary.expense_sketches.items():
+                total.expense_sketch(category).merge(sketch)
+        return total
+
+    def expense_sketch(self, category):
+        """Returns the sketch of a category's expenses, created if new."""
+        sketch = self.expense_sketches.get(category)
+        if sketch is None:
+            sketch = self.expense_sketches[category] = QuantileSketch()
+        return sketch
+
+    def sketches_to_json(self):
+        """Returns the amount sketches as JSON (for the reports)."""
+        return json.dumps({
+            "incomes": self.income_sketch.to_list(),
+            # Pairs, so the categories keep their order
+            "expenses": [
+                [category, sketch.to_list()]
+                for category, sketch in self.expense_sketches.items()],
+        }, separators=(",", ":"))
+
+    def sketches_from_json(self, text):
+        """Reads the amount sketches back from sketches_to_json()."""
+        sketches = json.loads(text)
+        self.income_sketch = QuantileSketch.from_list(sketches["incomes"])
+        self.expense_sketches = {
+            category: QuantileSketch.from_list(levels)
+            for category, levels in sketches["expenses"]}
+
+    def to_report_row(self, month):
+        """Returns the summary as a row of the reports worksheet."""
+        return [
+            month.title(), int(self.has_income), int(self.has_expenses),
+            self.total_income_cents, self.total_expenses_cents,
+            # Pairs, so the categories keep their order
+            json.dumps(list(self.expenses_by_category.items())),
+            json.dumps(self.invalid_rows),
+            datetime.now().isoformat(timespec="seconds"),
+            self.sketches_to_json(),
+        ]
+
+    @classmethod
+    def from_report_row(cls, row):
+        """Reads a summary back from a row of the reports worksheet."""
+        summary = cls()
+        summary.has_income = bool(int(row[1]))
+        summary.has_expenses = bool(int(row[2]))
+        summary.total_income_cents = read_cents(row[3])
+        summary.total_expenses_cents = read_cents(row[4])
+        summary.expenses_by_category = dict(json.loads(row[5]))
+        summary.invalid_rows = json.loads(row[6])
+        # Rows written before the sketches were kept have none
+        if len(row) > 8 and row[8]:
+            summary.sketches_from_json(row[8])
+        return summary
+
+
+class FinanceAggregate:
+    """Monthly summaries of both worksheets, built in a single pass."""
+
+    def __init__(self):
+        # lowercase month name -> MonthSummary
+        self.months = {month: MonthSummary() for month in MONTH_NAMES}
+        # Rows (header included) added so far from each worksheet
+        self.income_row_count = 0
+        self.expense_row_count = 0
+
+    @classmethod
+    def from_rows(cls, income_rows, expense_rows):
+        """Builds the aggregate from full worksheet snapshots."""
+        aggregate = cls()
+        aggregate.add_income_rows(income_rows)
+        aggregate.add_expense_rows(expense_rows)
+        return aggregate
+
+    def is_stale(self, income_rows, expense_rows):
+        """Checks whether the snapshots hold rows the index has not seen."""
+        return (
+            len(income_rows) != self.income_row_count or
+            len(expense_rows) != self.expense_row_count)
+
+    def month(self, month):
+        """Returns the MonthSummary of a month name (any case)."""
+        return self.months[month.lower()]
+
+    def add_income_rows(self, rows):
+        """Adds income rows, skipping rows of no known month (header)."""
+        self.income_row_count += len(rows)
+        for row in rows:
+            summary = self.months.get(row[0].lower()) if row else None
+            if summary is None:
+                continue
+            summary.has_income = True
+            try:
+                amount = row_amount_cents(
+                    row, INCOME_AMOUNT_COLUMN, INCOME_CENTS_COLUMN)
+            except (ValueError, IndexError):
+                summary.invalid_rows.append(row)
+                continue
+            summary.total_income_cents += amount
+            summary.income_sketch.add(amount)
+
+    def add_expense_rows(self, rows):
+        """Adds expense rows, skipping rows of no known month (header)."""
+        self.expense_row_count += len(rows)
+        for row in rows:
+            summary = self.months.get(row[0].lower()) if row else None
+            if summary is None:
+                continue
+            summary.has_expenses = True
+            try:
+                amount = row_amount_cents(
+                    row, EXPENSE_AMOUNT_COLUMN, EXPENSE_CENTS_COLUMN)
+            except (ValueError, IndexError):
+                summary.invalid_rows.append(row)
+                continue
+            summary.total_expenses_cents += amount
+            # Normalize category input to title
+            category = row[EXPENSE_CATEGORY_COLUMN].title()
+            by_category = summary.expenses_by_category
+            by_category[category] = by_category.get(category, 0) + amount
+            summary.expense_sketch(category).add(amount)
+
+
+def summaries_with_rows(summaries, income_rows, expense_rows):
+    """
+    Returns {month: MonthSummary} of summaries with some data rows added
+    (e.g. the rows not stored yet). The months the rows change get new
+    MonthSummary objects; the summaries given are left as they are.
+    """
+    if not income_rows and not expense_rows:
+        return summaries
+    added = FinanceAggregate.from_rows(income_rows, expense_rows)
+    summaries = dict(summaries)
+    for month, summary in summaries.items():
+        added_summary = added.month(month)
+        if added_summary.has_income or added_summary.has_expenses:
+            summaries[month] = MonthSummary.combined(
+                [summary, added_summary])
+    return summaries
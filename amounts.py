@@ -0,0 +1,77 @@
+"""
+Amount helpers for the CommunityFinances App.
+
+Amounts are kept as integer cents for all arithmetic, so sums are exact,
+and are only turned into the EU display format (1.234,56) when shown.
+
+Typed amounts are read by parse_amount_input() (EU or US format) and
+formatted by format_amount_for_display(). Stored amounts are parsed and
+formatted in cents by functions with an LRU cache, as the reports and
+the snapshot cache go through the same few amounts over and over.
+"""
+from functools import lru_cache
+import re
+
+
+# Everything but digits, dots and commas (spaces are thousands
+# separators, other characters are typos)
+_NOT_AMOUNT_CHARACTERS = re.compile(r"[^\d.,]")
+
+AMOUNT_CACHE_SIZE = 4096
+
+
+def to_cents(amount):
+    """Converts an amount in EUR (float) to integer cents."""
+    return int(round(amount * 100))
+
+
+def parse_amount_input(amount_input):
+    """
+    Reads a typed amount, in the European (1.234,56) or US (1,234.56)
+    format: whichever of "." and "," comes last is the decimal
+    separator, and a lone "," is one too. Raises ValueError if no
+    number is left.
+    """
+    amount_input = _NOT_AMOUNT_CHARACTERS.sub("", amount_input)
+    if amount_input.rfind(",") > amount_input.rfind("."):
+        # The thousands separators go and the decimal one becomes "."
+        amount_input = amount_input.replace(".", "").replace(",", ".")
+    else:
+        amount_input = amount_input.replace(",", "")
+    return float(amount_input)
+
+
+def format_amount_for_display(amount):
+    """Formats an amount in EUR in the European style (e.g., 1.234,56)."""
+    # "_" groups the thousands, so no placeholder swap is needed
+    return f"{amount:_.2f}".replace(".", ",").replace("_", ".")
+
+
+@lru_cache(maxsize=AMOUNT_CACHE_SIZE)
+def parse_stored_amount_cents(amount):
+    """
+    Converts an amount stored in the EU display format (e.g. 1.234,56)
+    to integer cents, without going through a float.
+    """
+    normalized = amount.strip().replace(".", "")
+    whole, _, fraction = normalized.partition(",")
+    if whole.isdigit() and (fraction == "" or fraction.isdigit()):
+        if len(fraction) <= 2:
+            return int(whole) * 100 + int(fraction.ljust(2, "0"))
+    # Anything else float() understands, as the reports always accepted
+    return to_cents(float(normalized.replace(",", ".")))
+
+
+def read_cents(value):
+    """Reads a stored amount_cents cell (int or numeric string)."""
+    if isinstance(value, int):
+        return value
+    return int(str(value).strip())
+
+
+@lru_cache(maxsize=AMOUNT_CACHE_SIZE)
+def format_cents_for_display(cents):
+    """Formats integer cents in the European style (e.g., 1.234,56)."""
+    sign = "-" if cents < 0 else ""
+    euros, remainder = divmod(abs(cents), 100)
+    return f"{sign}{euros:,}".replace(",", ".") + f",{remainder:02d}"
@@ -0,0 +1,177 @@
+"""
+Columnar snapshot files for the CommunityFinances App.
+
+export_snapshot() writes the incomes and expenses worksheets to Arrow
+IPC files (incomes.arrow and expenses.arrow in a directory), typed:
+
+    month, category      dictionary-encoded strings
+    source, description  strings
+    amount               the EU-formatted amount, as stored
+    amount_cents         int64, null where the amount cannot be read
+
+Analysts can open the files with pyarrow (or pandas/polars) as often as
+they like without a single Sheets API call:
+
+    python3 export_snapshot.py snapshot/
+
+ArrowSnapshot memory-maps the files: nothing is copied or parsed when
+they are opened, and a monthly report only reads the rows of its month.
+With FINANCES_REPORT_SNAPSHOT set to the directory, the app's reports
+come from the snapshot instead of the sheet (entries are still stored in
+the sheet).
+
+pyarrow is optional: it is only imported when a snapshot is written or
+read.
+"""
+import os
+
+try:
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+from aggregates import MonthSummary, row_amount_cents
+from schema import AMOUNT_CENTS_COLUMN, DISPLAY_COLUMNS, WORKSHEET_HEADERS
+
+
+DEFAULT_SNAPSHOT_DIR = "snapshot"
+# Columns stored dictionary-encoded (few distinct values)
+DICTIONARY_COLUMNS = ("month", "category")
+
+
+def snapshot_path(directory, worksheet_name):
+    """Returns the path of the snapshot file of a worksheet."""
+    return os.path.join(directory, f"{worksheet_name}.arrow")
+
+
+def _require_pyarrow():
+    """Raises ImportError if pyarrow is not installed."""
+    if pyarrow is None:
+        raise ImportError(
+            "pyarrow is needed for columnar snapshots: "
+            "pip install pyarrow")
+
+
+def snapshot_table(worksheet_name, rows):
+    """Returns the Arrow table of a worksheet snapshot (header first)."""
+    _require_pyarrow()
+    header = WORKSHEET_HEADERS[worksheet_name]
+    amount_column = header.index("amount")
+    cents_column = header.index(AMOUNT_CENTS_COLUMN)
+    data_rows = rows[1:]
+    columns = {}
+    for position, name in enumerate(DISPLAY_COLUMNS[worksheet_name]):
+        values = pyarrow.array(
+            [str(row[position]) if len(row) > position else ""
+             for row in data_rows],
+            pyarrow.string())
+        if name in DICTIONARY_COLUMNS:
+            values = values.dictionary_encode()
+        columns[name] = values
+    cents = []
+    for row in data_rows:
+        try:
+            cents.append(row_amount_cents(row, amount_column, cents_column))
+        except (ValueError, IndexError):
+            cents.append(None)
+    columns[AMOUNT_CENTS_COLUMN] = pyarrow.array(cents, pyarrow.int64())
+    return pyarrow.table(columns)
+
+
+def export_snapshot(storage, directory=DEFAULT_SNAPSHOT_DIR):
+    """
+    Writes both worksheets to Arrow IPC files in directory, each one
+    replaced atomically. Returns {worksheet name: rows written}.
+    """
+    _require_pyarrow()
+    os.makedirs(directory, exist_ok=True)
+    written = {}
+    for worksheet_name in DISPLAY_COLUMNS:
+        table = snapshot_table(
+            worksheet_name, storage.get_all_rows(worksheet_name))
+        path = snapshot_path(directory, worksheet_name)
+        with pyarrow.ipc.new_file(f"{path}.tmp", table.schema) as writer:
+            writer.write_table(table)
+        os.replace(f"{path}.tmp", path)
+        written[worksheet_name] = table.num_rows
+    return written
+
+
+class ArrowSnapshot:
+    """
+    The worksheets of a snapshot directory, memory-mapped (read-only).
+    tables holds a pyarrow Table per worksheet.
+    """
+
+    def __init__(self, directory=DEFAULT_SNAPSHOT_DIR):
+        _require_pyarrow()
+        self.directory = directory
+        self.tables = {}
+        for worksheet_name in DISPLAY_COLUMNS:
+            source = pyarrow.memory_map(
+                snapshot_path(directory, worksheet_name))
+            # Backed by the mapped file: no copy, no parsing
+            self.tables[worksheet_name] = pyarrow.ipc.open_file(
+                source).read_all()
+
+    def _month_rows(self, worksheet_name, month):
+        """Returns the rows of one month (any case) of a worksheet."""
+        table = self.tables[worksheet_name]
+        masks = []
+        # Compared on the dictionary (a dozen values), then selected by
+        # code, so the month names of the rows are never decoded
+        for chunk in table.column("month").chunks:
+            codes = [
+                code for code, name in enumerate(
+                    chunk.dictionary.to_pylist())
+                if name is not None and name.lower() == month.lower()]
+            masks.append(pyarrow.compute.is_in(
+                chunk.indices,
+                value_set=pyarrow.array(codes, chunk.indices.type)))
+        return table.filter(pyarrow.chunked_array(masks, pyarrow.bool_()))
+
+    def _invalid_rows(self, worksheet_name, rows):
+        """Returns the rows whose amount cannot be read, as lists."""
+        invalid = rows.filter(
+            pyarrow.compute.is_null(rows.column(AMOUNT_CENTS_COLUMN)))
+        columns = DISPLAY_COLUMNS[worksheet_name]
+        return [
+            [record[name] for name in columns]
+            for record in invalid.select(columns).to_pylist()]
+
+    def month_summary(self, month):
+        """Returns the MonthSummary of a month, from the snapshot."""
+        summary = MonthSummary()
+
+        incomes = self._month_rows("incomes", month)
+        summary.has_income = incomes.num_rows > 0
+        summary.total_income_cents = pyarrow.compute.sum(
+            incomes.column(AMOUNT_CENTS_COLUMN)).as_py() or 0
+        summary.income_sketch.add_many(
+            incomes.column(AMOUNT_CENTS_COLUMN).drop_null().to_pylist())
+        summary.invalid_rows.extend(self._invalid_rows("incomes", incomes))
+
+        expenses = self._month_rows("expenses", month)
+        summary.has_expenses = expenses.num_rows > 0
+        summary.total_expenses_cents = pyarrow.compute.sum(
+            expenses.column(AMOUNT_CENTS_COLUMN)).as_py() or 0
+        summary.invalid_rows.extend(self._invalid_rows("expenses", expenses))
+
+        # One thread keeps the categories in the order they first appear,
+        # like FinanceAggregate
+        totals = expenses.filter(
+            pyarrow.compute.is_valid(expenses.column(AMOUNT_CENTS_COLUMN))
+        ).group_by("category", use_threads=False).aggregate(
+            [(AMOUNT_CENTS_COLUMN, "sum"), (AMOUNT_CENTS_COLUMN, "list")])
+        by_category = summary.expenses_by_category
+        for category, cents, amounts in zip(
+                totals.column("category").to_pylist(),
+                totals.column(f"{AMOUNT_CENTS_COLUMN}_sum").to_pylist(),
+                totals.column(f"{AMOUNT_CENTS_COLUMN}_list").to_pylist()):
+            # Normalize category input to title
+            category = category.title()
+            by_category[category] = by_category.get(category, 0) + cents
+            summary.expense_sketch(category).add_many(amounts)
+        return summary
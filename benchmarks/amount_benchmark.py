@@ -0,0 +1,133 @@
+"""
+Amount codec benchmark: parses and formats amounts with the former
+regex/replace chains and with the codec of amounts.py, after checking
+on random inputs that both give the same results (same float or same
+error, same display string, and a format/parse round trip that gives
+the amount back).
+
+Usage (from the project folder):
+
+    python3 benchmarks/amount_benchmark.py [--values 100000] [--checks N]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import amounts  # noqa: E402
+
+
+def former_parse_amount_input(amount_input):
+    """The parsing of FinanceManager.get_validated_and_normalized_amount."""
+    amount_input = re.sub(r"[^\d., ]", "", amount_input)
+    amount_input = amount_input.replace(" ", "")
+    if "," in amount_input and "." not in amount_input:
+        amount_input = amount_input.replace(",", ".")
+    elif "." in amount_input and "," in amount_input:
+        last_dot = amount_input.rfind(".")
+        last_comma = amount_input.rfind(",")
+        if amount_input[max(last_dot, last_comma)] == ".":
+            amount_input = amount_input.replace(",", "")
+            amount_input = amount_input.replace(".", ",", 1)
+        else:
+            amount_input = amount_input.replace(".", "")
+    amount_input = amount_input.replace(",", ".")
+    return float(amount_input)
+
+
+def former_format_amount_for_display(amount):
+    """The former FinanceManager.format_amount_for_display."""
+    fmt = "{:,.2f}".format(amount)
+    return fmt.replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def random_amount_input(rng):
+    """Returns a typed amount: EU, US, plain, or with stray characters."""
+    cents = rng.randint(0, 10 ** rng.randint(1, 10))
+    text = rng.choice([
+        former_format_amount_for_display(cents / 100),
+        f"{cents / 100:,.2f}",
+        f"{cents / 100:.2f}",
+        str(cents),
+        f"{cents / 100:.3f}".replace(".", ","),
+    ])
+    for _ in range(rng.choice([0, 0, 0, 1, 2])):
+        position = rng.randint(0, len(text))
+        text = text[:position] + rng.choice(" .,€aE_-+1") + text[position:]
+    return text
+
+
+def outcome(function, value):
+    """Returns the result of a call, or the type of its error."""
+    try:
+        return function(value)
+    except ValueError as error:
+        return type(error)
+
+
+def check_same_behaviour(count, seed=1):
+    """Compares both parsers and formatters on count random inputs."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        text = random_amount_input(rng)
+        parsed = outcome(amounts.parse_amount_input, text)
+        assert parsed == outcome(former_parse_amount_input, text), text
+        if isinstance(parsed, float):
+            displayed = amounts.format_amount_for_display(parsed)
+            assert displayed == former_format_amount_for_display(parsed)
+            # Round trip: what is shown is read back as the same cents
+            assert amounts.to_cents(amounts.parse_amount_input(displayed)) \
+                == amounts.to_cents(round(parsed, 2)), text
+            assert amounts.parse_stored_amount_cents(displayed) \
+                == amounts.to_cents(round(parsed, 2)), text
+            assert amounts.format_cents_for_display(
+                amounts.parse_stored_amount_cents(displayed)) == displayed
+
+
+def main():
+    """Runs the checks, then times both implementations."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--values", type=int, default=100000)
+    parser.add_argument("--checks", type=int, default=200000)
+    args = parser.parse_args()
+
+    check_same_behaviour(args.checks)
+    print(f"{args.checks} random amounts: same results\n")
+
+    rng = random.Random(2)
+    typed = [random_amount_input(rng) for _ in range(args.values)]
+    typed = [text for text in typed
+             if not isinstance(outcome(former_parse_amount_input, text),
+                               type)]
+    floats = [former_parse_amount_input(text) for text in typed]
+    # The reports read few distinct amounts many times over
+    cents = [rng.randint(1, 2000) * 5 for _ in range(args.values)]
+    stored = [amounts.format_cents_for_display(value) for value in cents]
+
+    cases = [
+        ("parse typed amount", former_parse_amount_input,
+         amounts.parse_amount_input, typed),
+        ("format for display", former_format_amount_for_display,
+         amounts.format_amount_for_display, floats),
+        # The former stored-amount functions are the same, uncached
+        ("parse stored amount", amounts.parse_stored_amount_cents.__wrapped__,
+         amounts.parse_stored_amount_cents, stored),
+        ("format stored cents", amounts.format_cents_for_display.__wrapped__,
+         amounts.format_cents_for_display, cents),
+    ]
+    print(f"{'':<20}  {'former':>10}  {'codec':>10}")
+    for name, former, codec, values in cases:
+        former_seconds = timeit.timeit(
+            lambda: [former(value) for value in values], number=1)
+        codec_seconds = timeit.timeit(
+            lambda: [codec(value) for value in values], number=1)
+        print(f"{name:<20}  {former_seconds * 1000:>8.1f}ms  "
+              f"{codec_seconds * 1000:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
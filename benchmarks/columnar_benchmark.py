@@ -0,0 +1,82 @@
+"""
+Columnar analytics benchmark: builds the monthly aggregates of synthetic
+worksheets with the row loops of FinanceAggregate and with the NumPy
+reductions of columnar.py, from 1k to 1M rows per worksheet.
+
+Usage (from the project folder, NumPy installed):
+
+    python3 benchmarks/columnar_benchmark.py [--sizes 1000 10000 ...]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregates import FinanceAggregate, MONTH_NAMES  # noqa: E402
+import columnar  # noqa: E402
+from synthetic import income_rows, expense_rows  # noqa: E402
+
+
+def timed(function, *args):
+    """Returns (seconds, result) of one call."""
+    started_at = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - started_at, result
+
+
+def same_results(first, second):
+    """Checks that two aggregates hold the same numbers for every month."""
+    for month in MONTH_NAMES:
+        a, b = first.month(month), second.month(month)
+        first_numbers = (
+            a.has_income, a.has_expenses, a.total_income_cents,
+            a.total_expenses_cents, list(a.expenses_by_category.items()))
+        second_numbers = (
+            b.has_income, b.has_expenses, b.total_income_cents,
+            b.total_expenses_cents, list(b.expenses_by_category.items()))
+        if first_numbers != second_numbers:
+            return False
+    return True
+
+
+def main():
+    """Runs the benchmark for each size."""
+    if columnar.load_numpy() is None:
+        sys.exit("NumPy is not installed: only the row loops are available.")
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+",
+        default=[1000, 10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>9}  {'loops':>10}  {'numpy build':>12}  "
+          f"{'numpy reduce':>13}")
+    for size in args.sizes:
+        incomes = income_rows(size)
+        expenses = expense_rows(size)
+
+        loop_seconds, by_loops = timed(
+            FinanceAggregate.from_rows, incomes, expenses)
+
+        build_seconds, (income_columns, expense_columns) = timed(
+            lambda: (
+                columnar.ColumnarSnapshot.from_rows(
+                    incomes, columnar.INCOME_AMOUNT_COLUMN,
+                    columnar.INCOME_CENTS_COLUMN),
+                columnar.ColumnarSnapshot.from_rows(
+                    expenses, columnar.EXPENSE_AMOUNT_COLUMN,
+                    columnar.EXPENSE_CENTS_COLUMN,
+                    columnar.EXPENSE_CATEGORY_COLUMN)))
+        reduce_seconds, by_numpy = timed(
+            columnar.aggregate_columns, income_columns, expense_columns)
+
+        assert same_results(by_loops, by_numpy)
+        print(f"{size:>9}  {loop_seconds * 1000:>8.1f}ms  "
+              f"{build_seconds * 1000:>10.1f}ms  "
+              f"{reduce_seconds * 1000:>11.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
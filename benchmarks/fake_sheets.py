@@ -0,0 +1,237 @@
+"""
+In-memory stand-in for the gspread spreadsheet used by the app, so the
+benchmarks can run GoogleSheetsStorage (and the FinanceManager on top
+of it) without Google credentials or network access.
+
+FakeSpreadsheet and FakeWorksheet implement the gspread methods that
+storage.py calls, with the same return values (cells read back as
+strings, trailing empty cells and rows left out of range reads). Every
+call sleeps for latency seconds first, like a round trip to the Sheets
+API would take. calls counts the calls made, by method.
+
+    spreadsheet = FakeSpreadsheet({
+        "incomes": income_rows(100000),
+        "expenses": expense_rows(100000)}, latency=0.1)
+    storage = fake_sheets_storage(spreadsheet)
+"""
+from collections import Counter
+import re
+import time
+
+try:
+    from gspread.exceptions import WorksheetNotFound
+except ImportError:
+    class WorksheetNotFound(Exception):
+        """Raised for a worksheet title that does not exist."""
+
+from sheets_client import SheetsApiClient
+from storage import GoogleSheetsStorage
+
+
+DEFAULT_LATENCY = 0.1
+# A1 notation: A2:F51, A2:F (to the last row), A1, C
+A1_RANGE = re.compile(r"([A-Z]+)(\d*)(?::([A-Z]+)(\d*))?$")
+
+
+def column_number(letters):
+    """Returns the 0-based number of a column (A is 0)."""
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - ord("A") + 1
+    return number - 1
+
+
+def parse_range(a1_range):
+    """
+    Returns (first row, end row, first column, end column), 0-based
+    with exclusive ends (None: to the end), of an A1 range.
+    """
+    first_column, first_row, last_column, last_row = A1_RANGE.match(
+        a1_range).groups()
+    if last_column is None:
+        # A single cell (A1) or column (C)
+        last_column, last_row = first_column, first_row
+    end_row = int(last_row) if last_row else None
+    return (
+        int(first_row) - 1 if first_row else 0, end_row,
+        column_number(first_column), column_number(last_column) + 1)
+
+
+def trimmed(rows):
+    """Drops trailing empty cells and rows, as the Sheets API does."""
+    rows = [list(row) for row in rows]
+    for row in rows:
+        while row and row[-1] == "":
+            row.pop()
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+
+class FakeWorksheet:
+    """A worksheet: a list of rows of strings."""
+
+    def __init__(self, spreadsheet, title, rows=None, cols=26):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.rows = [[str(cell) for cell in row] for row in rows or []]
+        # Columns of the grid (26 in a new Google Sheet)
+        self.col_count = max([cols] + [len(row) for row in self.rows])
+
+    def read(self, a1_range):
+        """Returns the cells of a range (no latency)."""
+        first_row, end_row, first_column, end_column = parse_range(a1_range)
+        return trimmed(
+            row[first_column:end_column]
+            for row in self.rows[first_row:end_row])
+
+    def write(self, values, a1_range):
+        """Writes values from the top left cell of a range (no latency)."""
+        first_row, _, first_column, _ = parse_range(a1_range)
+        end_column = first_column + max(map(len, values), default=0)
+        if end_column > self.col_count:
+            raise ValueError(
+                f"Range ('{self.title}'!{a1_range}) exceeds grid limits. "
+                f"Max columns: {self.col_count}")
+        for number, values_row in enumerate(values):
+            while len(self.rows) <= first_row + number:
+                self.rows.append([])
+            row = self.rows[first_row + number]
+            end_column = first_column + len(values_row)
+            row.extend([""] * (end_column - len(row)))
+            row[first_column:end_column] = [
+                str(value) for value in values_row]
+
+    def get_all_values(self):
+        """Returns all rows, padded to the same width."""
+        self.spreadsheet.api_call("get_all_values")
+        width = max((len(row) for row in self.rows), default=0)
+        return [row + [""] * (width - len(row)) for row in self.rows]
+
+    def get(self, range_name):
+        """Returns the cells of a range."""
+        self.spreadsheet.api_call("get")
+        return self.read(range_name)
+
+    def col_values(self, column):
+        """Returns the cells of a column (1-based), down to the last one."""
+        self.spreadsheet.api_call("col_values")
+        values = [
+            row[column - 1] if len(row) >= column else ""
+            for row in self.rows]
+        while values and values[-1] == "":
+            values.pop()
+        return values
+
+    def append_row(self, values, **kwargs):
+        """Appends a row below the last one."""
+        self.spreadsheet.api_call("append_row")
+        self.rows.append([str(value) for value in values])
+
+    def append_rows(self, values, **kwargs):
+        """Appends rows below the last one."""
+        self.spreadsheet.api_call("append_rows")
+        self.rows.extend([str(value) for value in row] for row in values)
+
+    def update(self, values=None, range_name=None, **kwargs):
+        """Writes values from the top left cell of a range."""
+        self.spreadsheet.api_call("update")
+        self.write(values, range_name or "A1")
+
+    def add_cols(self, cols):
+        """Adds columns to the grid."""
+        self.spreadsheet.api_call("add_cols")
+        self.col_count += cols
+
+    def clear(self):
+        """Empties the worksheet."""
+        self.spreadsheet.api_call("clear")
+        self.rows = []
+
+    def batch_clear(self, ranges):
+        """Empties the cells of several ranges."""
+        self.spreadsheet.api_call("batch_clear")
+        for a1_range in ranges:
+            first_row, end_row, first_column, end_column = parse_range(
+                a1_range)
+            for row in self.rows[first_row:end_row]:
+                for column in range(first_column, min(end_column, len(row))):
+                    row[column] = ""
+        self.rows = trimmed(self.rows)
+
+
+class FakeSpreadsheet:
+    """A spreadsheet: worksheets by title, with a latency per call."""
+
+    def __init__(self, worksheets=None, latency=DEFAULT_LATENCY,
+                 sleep=time.sleep):
+        self.latency = latency
+        self.sleep = sleep
+        self.calls = Counter()
+        self._worksheets = {
+            title: FakeWorksheet(self, title, rows)
+            for title, rows in (worksheets or {}).items()}
+
+    def api_call(self, method_name):
+        """Counts a call and waits for its round trip."""
+        self.calls[method_name] += 1
+        if self.latency:
+            self.sleep(self.latency)
+
+    def _range(self, a1_range):
+        """Returns (worksheet, A1 range) of a "'title'!A1:B2" range."""
+        title, _, a1_range = a1_range.rpartition("!")
+        return self._worksheets[title.strip("'")], a1_range
+
+    def worksheets(self):
+        """Returns all worksheets."""
+        self.api_call("worksheets")
+        return list(self._worksheets.values())
+
+    def worksheet(self, title):
+        """Returns the worksheet with a title."""
+        self.api_call("worksheet")
+        if title not in self._worksheets:
+            raise WorksheetNotFound(title)
+        return self._worksheets[title]
+
+    def add_worksheet(self, title, rows, cols, **kwargs):
+        """Adds an empty worksheet."""
+        self.api_call("add_worksheet")
+        if title in self._worksheets:
+            raise ValueError(f"A sheet with the name {title} already exists")
+        worksheet = self._worksheets[title] = FakeWorksheet(
+            self, title, cols=cols)
+        return worksheet
+
+    def values_batch_get(self, ranges, **kwargs):
+        """Reads several ranges with one call."""
+        self.api_call("values_batch_get")
+        value_ranges = []
+        for a1_range in ranges:
+            worksheet, cells = self._range(a1_range)
+            value_range = {"range": a1_range}
+            values = worksheet.read(cells)
+            if values:
+                value_range["values"] = values
+            value_ranges.append(value_range)
+        return {"valueRanges": value_ranges}
+
+    def values_batch_update(self, body=None, **kwargs):
+        """Writes several ranges with one call."""
+        self.api_call("values_batch_update")
+        for value_range in body["data"]:
+            worksheet, cells = self._range(value_range["range"])
+            worksheet.write(value_range["values"], cells)
+
+
+def fake_sheets_storage(spreadsheet):
+    """
+    Returns a GoogleSheetsStorage on a FakeSpreadsheet, with no rate
+    limit (the latency already stands for the API).
+    """
+    unlimited = 10 ** 9
+    return GoogleSheetsStorage(
+        open_spreadsheet=lambda: spreadsheet,
+        client=SheetsApiClient(
+            reads_per_minute=unlimited, writes_per_minute=unlimited))
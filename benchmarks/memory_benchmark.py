@@ -0,0 +1,67 @@
+"""
+Snapshot memory benchmark: measures with tracemalloc the memory held by
+a synthetic expenses worksheet as the list of lists downloaded from the
+sheet and as CompactRows (rowstore.py), from 1k to 100k rows.
+
+Usage (from the project folder):
+
+    python3 benchmarks/memory_benchmark.py [--sizes 1000 10000 ...]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rowstore import CompactRows  # noqa: E402
+from synthetic import expense_rows  # noqa: E402
+
+
+def downloaded_rows(count):
+    """
+    Returns an expenses snapshot whose cells are all distinct objects,
+    as they are after decoding an API response (not shared literals).
+    """
+    return json.loads(json.dumps(expense_rows(count)))
+
+
+def measured(function, *args):
+    """Returns (bytes still allocated, result) of one call."""
+    gc.collect()
+    tracemalloc.start()
+    result = function(*args)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return allocated, result
+
+
+def compact_rows(count):
+    """Returns the same snapshot as CompactRows."""
+    return CompactRows.from_rows(downloaded_rows(count))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+        help="data rows of the worksheet")
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'list of lists':>14} {'CompactRows':>12} "
+          f"{'ratio':>6}")
+    for size in args.sizes:
+        list_bytes, rows = measured(downloaded_rows, size)
+        compact_bytes, compact = measured(compact_rows, size)
+        if list(compact) != rows:
+            sys.exit(f"{size} rows: CompactRows does not match the rows")
+        print(f"{size:>8} {list_bytes / 2**20:>11.1f} MB "
+              f"{compact_bytes / 2**20:>9.1f} MB "
+              f"{list_bytes / compact_bytes:>5.1f}x")
+        del rows, compact
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Monthly report benchmark: compares the five worksheet scans a report
+used to make (_month_has_data twice, _calculate_total_amount twice and
+_calc_expenses_by_category once) with FinanceAggregate, which scans
+each worksheet once (summing integer cents) and then answers any month
+with a lookup.
+
+Usage (from the project folder):
+
+    python3 benchmarks/report_benchmark.py [--rows 100000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregates import FinanceAggregate, MONTH_NAMES  # noqa: E402
+from synthetic import income_rows, expense_rows  # noqa: E402
+
+
+def legacy_month_report(income_data, expenses_data, month):
+    """The per-report scans of the original FinanceManager."""
+    def has_data(rows):
+        return any(row[0].lower() == month.lower() for row in rows)
+
+    def total(rows, column):
+        amount = 0
+        for row in rows:
+            if row[0].lower() == month.lower():
+                try:
+                    amount += float(
+                        row[column].replace(".", "").replace(",", "."))
+                except ValueError:
+                    pass
+        return amount
+
+    def by_category(rows):
+        categories = {}
+        for row in rows:
+            if row[0].lower() == month.lower():
+                try:
+                    amount = float(row[3].replace(".", "").replace(",", "."))
+                except ValueError:
+                    continue
+                category = row[1].title()
+                categories[category] = categories.get(category, 0) + amount
+        return categories
+
+    return (
+        has_data(income_data), has_data(expenses_data),
+        total(income_data, 2), total(expenses_data, 3),
+        by_category(expenses_data))
+
+
+def timed(function, *args):
+    """Returns (seconds, result) of one call."""
+    started_at = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - started_at, result
+
+
+def main():
+    """Runs the benchmark and checks both approaches agree."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    incomes = income_rows(args.rows)
+    expenses = expense_rows(args.rows)
+    print(f"{args.rows} rows per worksheet")
+
+    legacy_seconds = 0
+    for month in MONTH_NAMES:
+        seconds, expected = timed(
+            legacy_month_report, incomes, expenses, month)
+        legacy_seconds += seconds
+    legacy_ms = legacy_seconds * 1000
+    print(f"legacy scans, one month       {legacy_ms / 12:9.1f} ms")
+    print(f"legacy scans, all 12 months   {legacy_ms:9.1f} ms")
+
+    build_seconds, aggregate = timed(
+        FinanceAggregate.from_rows, incomes, expenses)
+    print(f"aggregate build (single pass) {build_seconds * 1000:9.1f} ms")
+
+    lookup_seconds = 0
+    for month in MONTH_NAMES:
+        seconds, summary = timed(aggregate.month, month)
+        lookup_seconds += seconds
+    print(f"aggregate lookup, per month   {lookup_seconds / 12 * 1e6:9.1f} us")
+
+    # Sanity check against the last legacy report (float sums)
+    assert abs(summary.total_income_cents / 100 - expected[2]) < 0.01
+    assert abs(summary.total_expenses_cents / 100 - expected[3]) < 0.01
+    for category, cents in summary.expenses_by_category.items():
+        assert abs(cents / 100 - expected[4][category]) < 0.01
+
+
+if __name__ == "__main__":
+    main()
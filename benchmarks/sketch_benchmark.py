@@ -0,0 +1,91 @@
+"""
+Quantile sketch benchmark: the median and 90th percentile of the
+expense amounts from the KLL sketches of sketches.py, against sorting
+all the amounts, on synthetic expenses.
+
+For each size it prints the rank error of the sketch (how far the
+returned amount is from the exact quantile, as a fraction of the
+amounts), the items the sketch keeps, and the time to add the amounts
+one by one, to merge 12 monthly sketches, to read a quantile, and to
+sort all the amounts (what every request would cost without sketches).
+
+Usage (from the project folder):
+
+    python3 benchmarks/sketch_benchmark.py [--sizes 1000 100000 1000000]
+"""
+import argparse
+import bisect
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregates import EXPENSE_CENTS_COLUMN  # noqa: E402
+from sketches import QuantileSketch  # noqa: E402
+from synthetic import expense_rows  # noqa: E402
+
+
+FRACTIONS = (0.5, 0.9)
+
+
+def rank_error(sorted_amounts, value, fraction):
+    """Returns how far value is from the fraction quantile, in ranks."""
+    rank = bisect.bisect_right(sorted_amounts, value) / len(sorted_amounts)
+    return abs(rank - fraction)
+
+
+def monthly_sketches(amounts):
+    """Returns 12 sketches, of the amounts split in 12 partitions."""
+    sketches = [QuantileSketch() for _ in range(12)]
+    for position, amount in enumerate(amounts):
+        sketches[position % 12].add(amount)
+    return sketches
+
+
+def merged(sketches):
+    """Returns the sketch of the values of several sketches."""
+    total = QuantileSketch()
+    for sketch in sketches:
+        total.merge(sketch)
+    return total
+
+
+def main():
+    """Prints the accuracy, size and timings of the sketches."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>9}  {'p50 err':>8}  {'p90 err':>8}  {'items':>6}  "
+          f"{'add':>9}  {'merge 12':>9}  {'quantile':>9}  {'sort':>9}")
+    for size in args.sizes:
+        amounts = [
+            int(row[EXPENSE_CENTS_COLUMN]) for row in expense_rows(size)[1:]]
+        sorted_amounts = sorted(amounts)
+
+        sketch = QuantileSketch()
+        add_seconds = timeit.timeit(
+            lambda: [sketch.add(amount) for amount in amounts], number=1)
+        partitions = monthly_sketches(amounts)
+        merge_seconds = timeit.timeit(lambda: merged(partitions), number=1)
+        quantile_seconds = timeit.timeit(
+            lambda: sketch.quantile(0.9), number=10) / 10
+        sort_seconds = timeit.timeit(lambda: sorted(amounts), number=1)
+
+        # Either sketch can be read: the merged one is checked too
+        errors = [
+            max(rank_error(sorted_amounts, each.quantile(fraction), fraction)
+                for each in (sketch, merged(partitions)))
+            for fraction in FRACTIONS]
+        items = sum(len(level) for level in sketch.levels)
+        print(f"{size:>9}  {errors[0]:>8.2%}  {errors[1]:>8.2%}  "
+              f"{items:>6}  {add_seconds * 1000:>7.1f}ms  "
+              f"{merge_seconds * 1000:>7.2f}ms  "
+              f"{quantile_seconds * 1000:>7.2f}ms  "
+              f"{sort_seconds * 1000:>7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
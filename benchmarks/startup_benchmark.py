@@ -0,0 +1,88 @@
+"""
+Start-up benchmark: measures the time from launching "python3 run.py"
+until the MENU OPTIONS are printed (time-to-first-menu).
+
+Usage (from the project folder):
+
+    python3 benchmarks/startup_benchmark.py [--runs 10] [--compare REV]
+
+--compare REV also measures the run.py of an earlier git revision (for
+example the commit before lazy initialization), so both numbers can be
+read side by side. Revisions that open the Google Sheet at import time
+need a valid creds.json in the project folder to reach the menu.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MENU_MARKER = b"MENU OPTIONS"
+
+
+def time_to_first_menu(project_dir, timeout=60):
+    """Starts run.py in project_dir and times it until the menu shows."""
+    started_at = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "run.py"], cwd=project_dir,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT)
+    output = b""
+    try:
+        while MENU_MARKER not in output:
+            chunk = process.stdout.read1(4096)
+            if not chunk:
+                raise RuntimeError(
+                    "run.py exited before showing the menu:\n" +
+                    output.decode(errors="replace")[-2000:])
+            output += chunk
+            if time.perf_counter() - started_at > timeout:
+                raise RuntimeError("Timed out waiting for the menu")
+        return time.perf_counter() - started_at
+    finally:
+        process.kill()
+        process.wait()
+
+
+def export_revision(revision, target_dir):
+    """Writes the files of a git revision into target_dir."""
+    archive = subprocess.run(
+        ["git", "archive", revision], cwd=PROJECT_DIR,
+        check=True, capture_output=True).stdout
+    subprocess.run(
+        ["tar", "-x", "-C", target_dir], input=archive, check=True)
+    creds_path = os.path.join(PROJECT_DIR, "creds.json")
+    if os.path.exists(creds_path):
+        shutil.copy(creds_path, target_dir)
+
+
+def report(label, project_dir, runs):
+    """Prints the timing summary of several runs."""
+    timings = [time_to_first_menu(project_dir) for _ in range(runs)]
+    print(
+        f"{label:<12} median {statistics.median(timings) * 1000:8.1f} ms   "
+        f"min {min(timings) * 1000:8.1f} ms   "
+        f"max {max(timings) * 1000:8.1f} ms   ({runs} runs)")
+
+
+def main():
+    """Runs the benchmark for the working tree (and a revision)."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--compare", metavar="REV")
+    args = parser.parse_args()
+
+    if args.compare:
+        with tempfile.TemporaryDirectory() as revision_dir:
+            export_revision(args.compare, revision_dir)
+            report(args.compare, revision_dir, args.runs)
+    report("working tree", PROJECT_DIR, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Benchmark suite: times the FinanceManager screens and the helpers
+behind them on synthetic worksheets of 1k, 100k and 1M rows, against
+the in-memory fake Google Sheet of fake_sheets.py (no credentials or
+network needed), with a latency per Sheets API call.
+
+    display_worksheet     first page of "view all" (incomes)
+    report (computed)     a monthly report from the worksheets
+    report (materialized) a monthly report from the reports worksheet
+    FinanceAggregate      the single-pass monthly aggregates (row loops)
+    columnar aggregate    the same with NumPy (when installed)
+    parse stored amounts  parse_stored_amount_cents() of every amount
+    parse typed amounts   parse_amount_input() of every amount
+
+Each case is run --repeat times on a fresh storage stack (cold caches)
+and the fastest run is kept. The results are saved as JSON in
+benchmarks/results/ (named after the git revision), and --compare
+prints the change against an earlier results file, flagging anything
+more than --threshold slower.
+
+Usage (from the project folder):
+
+    python3 benchmarks/suite.py [--sizes 1000 100000 1000000]
+        [--latency 0.1] [--repeat 3] [--compare RESULTS.json]
+"""
+import argparse
+import builtins
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(PROJECT_DIR, "benchmarks", "results")
+sys.path.insert(0, PROJECT_DIR)
+
+# A shared snapshot cache (and journal) outside the benchmark would
+# carry snapshots over from one run to the next
+os.environ["FINANCES_SHARED_CACHE_DIR"] = ""
+JOURNAL_DIR = tempfile.TemporaryDirectory(prefix="journal-")
+os.environ["FINANCES_JOURNAL_DIR"] = JOURNAL_DIR.name
+
+import amounts  # noqa: E402
+from aggregates import FinanceAggregate  # noqa: E402
+import columnar  # noqa: E402
+from fake_sheets import FakeSpreadsheet, fake_sheets_storage  # noqa: E402
+from run import FinanceManager  # noqa: E402
+from storage import create_storage  # noqa: E402
+from synthetic import expense_rows, income_rows  # noqa: E402
+
+
+REPORT_MONTH = "june"
+
+
+@contextmanager
+def answering(*answers):
+    """Feeds answers to input() and hides what the screens print."""
+    replies = iter(answers)
+    original_input = builtins.input
+    builtins.input = lambda prompt="": next(replies)
+    try:
+        with redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        builtins.input = original_input
+
+
+def new_manager(spreadsheet):
+    """Returns a FinanceManager on a fresh storage stack (a new session)."""
+    return FinanceManager(create_storage(fake_sheets_storage(spreadsheet)))
+
+
+def fastest(repeat, setup, function):
+    """Returns the fastest of repeat runs of function(setup())."""
+    timings = []
+    for _ in range(repeat):
+        argument = setup()
+        started_at = time.perf_counter()
+        function(argument)
+        timings.append(time.perf_counter() - started_at)
+    return min(timings)
+
+
+def run_cases(size, latency, repeat):
+    """Returns {case name: seconds} for worksheets of size rows."""
+    incomes = income_rows(size)
+    expenses = expense_rows(size)
+    amount_strings = [row[3] for row in expenses[1:]]
+
+    def new_spreadsheet():
+        return FakeSpreadsheet(
+            {"incomes": incomes, "expenses": expenses}, latency=latency)
+
+    def fresh_manager():
+        return new_manager(new_spreadsheet())
+
+    def materialized_manager():
+        spreadsheet = new_spreadsheet()
+        new_manager(spreadsheet).storage.regenerate_reports()
+        # A later session, which has downloaded nothing yet
+        return new_manager(spreadsheet)
+
+    def display(manager):
+        with answering("D"):
+            manager.display_worksheet("incomes")
+
+    def report(manager):
+        with answering(REPORT_MONTH, "M"):
+            manager.generate_monthly_finance_report()
+
+    def cold_amounts():
+        amounts.parse_stored_amount_cents.cache_clear()
+        return amount_strings
+
+    results = {
+        "display_worksheet": fastest(repeat, fresh_manager, display),
+        "report (computed)": fastest(repeat, fresh_manager, report),
+        "report (materialized)": fastest(
+            repeat, materialized_manager, report),
+        "FinanceAggregate": fastest(
+            repeat, lambda: None,
+            lambda _: FinanceAggregate.from_rows(incomes, expenses)),
+        "parse stored amounts": fastest(
+            repeat, cold_amounts,
+            lambda values: [
+                amounts.parse_stored_amount_cents(value)
+                for value in values]),
+        "parse typed amounts": fastest(
+            repeat, lambda: amount_strings,
+            lambda values: [
+                amounts.parse_amount_input(value) for value in values]),
+    }
+    if columnar.load_numpy() is not None:
+        results["columnar aggregate"] = fastest(
+            repeat, lambda: None,
+            lambda _: columnar.build_finance_aggregate(incomes, expenses))
+    return results
+
+
+def git_revision():
+    """Returns the short git revision of the project, or None."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(results, args):
+    """Writes the results to benchmarks/results/ and returns the path."""
+    revision = git_revision()
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(
+        RESULTS_DIR,
+        f"{revision or datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as file:
+        json.dump({
+            "revision": revision,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "latency": args.latency,
+            "repeat": args.repeat,
+            # size (as a string, JSON keys) -> case name -> seconds
+            "results": results,
+        }, file, indent=2)
+    return path
+
+
+def compare(results, latency, baseline_path, threshold):
+    """
+    Prints each timing against the same one of a baseline results file.
+    Returns the number of regressions (more than threshold slower).
+    """
+    with open(baseline_path) as file:
+        baseline = json.load(file)
+    print(f"\nAgainst {baseline_path} "
+          f"(revision {baseline.get('revision')}):")
+    if baseline.get("latency") != latency:
+        print(f"Note: measured with a latency of {baseline.get('latency')}"
+              f" s per API call, not {latency} s")
+    regressions = 0
+    for size, cases in results.items():
+        for name, seconds in cases.items():
+            before = baseline["results"].get(size, {}).get(name)
+            if not before:
+                continue
+            change = seconds / before - 1
+            flag = ""
+            if change > threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"{size:>9}  {name:<22}  {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    """Runs the suite for each size and saves (and compares) the results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--compare", metavar="RESULTS.json")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'rows':>9}  {'case':<22}  {'seconds':>10}")
+    for size in args.sizes:
+        results[str(size)] = run_cases(size, args.latency, args.repeat)
+        for name, seconds in results[str(size)].items():
+            print(f"{size:>9}  {name:<22}  {seconds:>10.4f}")
+    # Compared first, as the baseline may be the file about to be saved
+    regressions = 0
+    if args.compare:
+        regressions = compare(
+            results, args.latency, args.compare, args.threshold)
+    print(f"\nResults saved to {save_results(results, args)}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
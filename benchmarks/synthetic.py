@@ -0,0 +1,51 @@
+"""
+Synthetic incomes/expenses worksheets for the benchmarks.
+
+The rows have the same layout as the Google Sheet: a header row, then
+month names, free text, categories, EU-formatted amount strings and the
+amounts in integer cents.
+"""
+import random
+
+from schema import CATEGORIES, MONTH_NAMES, WORKSHEET_HEADERS
+
+
+SOURCES = ["Salary", "Freelance", "Etsy shop", "Pension", "Tutoring"]
+DESCRIPTIONS = [
+    "Monthly rent", "Weekly groceries", "Bus pass", "Cinema tickets",
+    "Dentist visit", "Birthday present", "Online course", "Train tickets"]
+
+
+def eu_amount(cents):
+    """Formats an amount in cents the way the app stores it (1.234,56)."""
+    formatted = "{:,.2f}".format(cents / 100)
+    return formatted.replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def income_rows(count, seed=1):
+    """Returns an incomes snapshot with count data rows."""
+    rng = random.Random(seed)
+    rows = [WORKSHEET_HEADERS["incomes"]]
+    for _ in range(count):
+        cents = rng.randint(10000, 600000)
+        rows.append([
+            rng.choice(MONTH_NAMES).title(),
+            rng.choice(SOURCES),
+            eu_amount(cents),
+            cents])
+    return rows
+
+
+def expense_rows(count, seed=2):
+    """Returns an expenses snapshot with count data rows."""
+    rng = random.Random(seed)
+    rows = [WORKSHEET_HEADERS["expenses"]]
+    for _ in range(count):
+        cents = rng.randint(100, 250000)
+        rows.append([
+            rng.choice(MONTH_NAMES).title(),
+            rng.choice(CATEGORIES),
+            rng.choice(DESCRIPTIONS),
+            eu_amount(cents),
+            cents])
+    return rows
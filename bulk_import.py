@@ -0,0 +1,210 @@
+"""
+Bulk import of incomes/expenses for the CommunityFinances App.
+
+Run from the project folder, against the storage backend configured with
+FINANCES_STORAGE (see storage.py):
+
+    python3 bulk_import.py incomes partners.csv
+    python3 bulk_import.py expenses partners.json [rejects.csv]
+
+The file is read as a stream, one record at a time, so its size does
+not matter:
+
+    CSV   a header row naming the columns (month, source or category
+          and description, amount, in any order and case), then one
+          entry per row.
+    JSON  an array of objects with the same keys, or one object per
+          line (JSON Lines).
+
+Every record goes through the same validators as the data entry screens
+(validators.py). Valid rows are stored in batches of IMPORT_BATCH_ROWS,
+each with a single journal sync and a single append call; invalid ones
+are written to a reject report (by default <file>.rejects.csv) with the
+reason, so they can be fixed and imported again.
+"""
+import csv
+import json
+import os
+import sys
+import time
+
+from schema import DISPLAY_COLUMNS
+from storage import create_storage
+from validators import (
+    expense_row, income_row, validate_amount, validate_category,
+    validate_month, validate_text)
+
+
+IMPORT_BATCH_ROWS = 1000
+JSON_CHUNK_SIZE = 1 << 16
+
+
+def read_csv_records(file):
+    """Yields (line number, record) of a CSV file with a header row."""
+    reader = csv.DictReader(file)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def read_json_records(file, chunk_size=JSON_CHUNK_SIZE):
+    """
+    Yields (record number, record) of a JSON array of objects, or of
+    JSON Lines, reading chunk_size characters at a time.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    number = 0
+    at_end = False
+    in_array = False
+    while True:
+        # Skip what separates the records (and the array's brackets)
+        while position < len(buffer):
+            character = buffer[position]
+            if character == "[" and not number and not in_array:
+                in_array = True
+            elif character == "]" and in_array:
+                return
+            elif character not in " \t\r\n,":
+                break
+            position += 1
+        if position == len(buffer):
+            if at_end:
+                return
+            buffer = file.read(chunk_size)
+            position = 0
+            at_end = not buffer
+            continue
+        try:
+            record, end = decoder.raw_decode(buffer, position)
+        except ValueError:
+            if at_end:
+                raise
+            # A record cut by the end of the chunk: read on
+            chunk = file.read(chunk_size)
+            buffer = buffer[position:] + chunk
+            position = 0
+            at_end = not chunk
+            continue
+        number += 1
+        position = end
+        yield number, record
+
+
+def validated_row(worksheet_name, record):
+    """
+    Returns the stored row of a record (a dict of column name to value)
+    or raises ValueError with the reason it is rejected.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Not a record with named columns.")
+    values = {
+        str(name).strip().lower(): "" if value is None else str(value)
+        for name, value in record.items()}
+    missing = [
+        name for name in DISPLAY_COLUMNS[worksheet_name]
+        if name not in values]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}.")
+    month = validate_month(values["month"])
+    amount = validate_amount(values["amount"])
+    if worksheet_name == "incomes":
+        return income_row(month, validate_text(values["source"]), amount)
+    return expense_row(
+        month, validate_category(values["category"]),
+        validate_text(values["description"]), amount)
+
+
+class RejectReport:
+    """CSV report of the rejected records, created on the first one."""
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def add(self, position, record, reason):
+        """Adds a rejected record, with where it was and why."""
+        if self._writer is None:
+            self._file = open(self.path, "w", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(["position", "reason"] + self.columns)
+        if isinstance(record, dict):
+            values = {
+                str(name).strip().lower(): value
+                for name, value in record.items()}
+            cells = [values.get(column, "") for column in self.columns]
+        else:
+            cells = [json.dumps(record)]
+        self._writer.writerow([position, reason] + cells)
+        self.count += 1
+
+    def close(self):
+        """Closes the report file, if any record was rejected."""
+        if self._file is not None:
+            self._file.close()
+
+
+def import_entries(storage, worksheet_name, path, rejects_path=None,
+                   batch_rows=IMPORT_BATCH_ROWS):
+    """
+    Imports the records of a CSV or JSON file into a worksheet. Returns
+    (rows imported, records rejected).
+    """
+    if path.lower().endswith(".csv"):
+        read_records = read_csv_records
+    else:
+        read_records = read_json_records
+    rejects = RejectReport(
+        rejects_path or f"{path}.rejects.csv",
+        DISPLAY_COLUMNS[worksheet_name])
+    imported = 0
+    batch = []
+    try:
+        with open(path, newline="", encoding="utf-8-sig") as file:
+            for position, record in read_records(file):
+                try:
+                    batch.append(validated_row(worksheet_name, record))
+                except ValueError as error:
+                    rejects.add(position, record, str(error))
+                    continue
+                if len(batch) >= batch_rows:
+                    storage.append_rows(worksheet_name, batch)
+                    imported += len(batch)
+                    batch = []
+        if batch:
+            storage.append_rows(worksheet_name, batch)
+            imported += len(batch)
+    finally:
+        rejects.close()
+    return imported, rejects.count
+
+
+def main(args):
+    """Runs the import named on the command line."""
+    if not 2 <= len(args) <= 3 or args[0] not in DISPLAY_COLUMNS or \
+            not os.path.isfile(args[1]):
+        print(__doc__)
+        return 1
+    worksheet_name, path = args[:2]
+    rejects_path = args[2] if len(args) == 3 else f"{path}.rejects.csv"
+    storage = create_storage()
+    started_at = time.perf_counter()
+    imported, rejected = import_entries(
+        storage, worksheet_name, path, rejects_path)
+    if not storage.drain():
+        # They stay in the journal, the next session stores them
+        print("Not every row could be stored.")
+        return 1
+    seconds = time.perf_counter() - started_at
+    print(f"{imported} row(s) imported into {worksheet_name} in "
+          f"{seconds:.1f} s ({imported / max(seconds, 1e-9):.0f} rows/s)")
+    if rejected:
+        print(f"{rejected} record(s) rejected, see {rejects_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,182 @@
+"""
+Worksheet snapshot cache for the CommunityFinances App.
+
+A snapshot is the full list of rows of one worksheet, as returned by a
+storage backend. Snapshots are kept for a limited time (TTL) and only a
+limited number of them are kept at once (least recently used first out).
+Cached snapshots are stored as CompactRows (see rowstore.py), which
+take a fraction of the memory of the downloaded list of lists.
+"""
+from collections import OrderedDict
+from contextlib import ExitStack, nullcontext
+from itertools import islice
+import time
+
+from rowstore import CompactRows
+from schema import WORKSHEET_HEADERS
+from storage_wrapper import StorageWrapper
+
+
+DEFAULT_TTL_SECONDS = 60
+DEFAULT_MAX_ENTRIES = 8
+
+
+class SnapshotCache:
+    """Holds worksheet snapshots with a TTL and a size bound."""
+
+    def __init__(self, ttl=DEFAULT_TTL_SECONDS,
+                 max_entries=DEFAULT_MAX_ENTRIES, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        # worksheet name -> (time stored, rows)
+        self._entries = OrderedDict()
+
+    def refreshing(self, worksheet_name):
+        """
+        Held while a snapshot is downloaded. Only this process uses the
+        cache, so there is nobody to wait for (see shared_cache.py).
+        """
+        return nullcontext()
+
+    def get(self, worksheet_name):
+        """Returns the cached rows of a worksheet, or None if not fresh."""
+        entry = self._entries.get(worksheet_name)
+        if entry is None:
+            return None
+        stored_at, rows = entry
+        if self.clock() - stored_at > self.ttl:
+            del self._entries[worksheet_name]
+            return None
+        self._entries.move_to_end(worksheet_name)
+        return rows
+
+    def put(self, worksheet_name, rows):
+        """Stores a snapshot, evicting the least recently used ones."""
+        if self.max_entries <= 0:
+            return
+        self._entries[worksheet_name] = (self.clock(), rows)
+        self._entries.move_to_end(worksheet_name)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def append_rows(self, worksheet_name, rows):
+        """Adds newly written rows to a cached snapshot, if there is one."""
+        cached_rows = self.get(worksheet_name)
+        if cached_rows is not None:
+            cached_rows.extend(list(row) for row in rows)
+
+    def invalidate(self, worksheet_name=None):
+        """Drops one snapshot, or all of them when no name is given."""
+        if worksheet_name is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(worksheet_name, None)
+
+
+class CachedStorage(StorageWrapper):
+    """
+    Wraps a storage backend so that each worksheet is downloaded at most
+    once per TTL window. Rows appended through this wrapper are added to
+    the cached snapshot, so a session sees its own entries straight away.
+    The materialized report rows are not cached.
+    """
+
+    def __init__(self, storage, cache=None):
+        super().__init__(storage)
+        self.cache = cache if cache is not None else SnapshotCache()
+
+    def refreshing(self, worksheet_name):
+        """
+        Holds the refresh lock of a worksheet (shared by the sessions of
+        the host with a SharedSnapshotCache) while in a with block.
+        """
+        return self.cache.refreshing(worksheet_name)
+
+    def get_all_rows(self, worksheet_name):
+        """Gets all rows of a worksheet, from the cache when possible."""
+        rows = self.cache.get(worksheet_name)
+        if rows is None:
+            with self.cache.refreshing(worksheet_name):
+                # Another process may have downloaded it in the meantime
+                rows = self.cache.get(worksheet_name)
+                if rows is None:
+                    rows = CompactRows.from_rows(
+                        self.storage.get_all_rows(worksheet_name))
+                    self.cache.put(worksheet_name, rows)
+                else:
+                    # Its download served this read too
+                    self.api_metrics["coalesced"] += 1
+        return rows
+
+    def get_month_rows(self, worksheet_name, month):
+        """
+        Gets the data rows of one month: filtered from the cached
+        snapshot if there is one, else read by month (not cached).
+        """
+        rows = self.cache.get(worksheet_name)
+        if rows is None:
+            return self.storage.get_month_rows(worksheet_name, month)
+        # One row rebuilt at a time, never the whole snapshot
+        return [
+            row for row in islice(rows, 1, None)
+            if row and str(row[0]).lower() == month.lower()]
+
+    def get_rows(self, worksheet_name, start, count):
+        """
+        Gets count data rows, from data row number start: a slice of the
+        cached snapshot if there is one, else a range read (not cached).
+        """
+        rows = self.cache.get(worksheet_name)
+        if rows is None:
+            return self.storage.get_rows(worksheet_name, start, count)
+        return rows[start + 1:start + count + 1]
+
+    def get_column_values(self, worksheet_name, column_name):
+        """Gets the cells of one column, from the cache when possible."""
+        rows = self.cache.get(worksheet_name)
+        if rows is None:
+            return self.storage.get_column_values(worksheet_name, column_name)
+        # The sheet's header row may lack the newer column names
+        position = WORKSHEET_HEADERS[worksheet_name].index(column_name)
+        return [
+            row[position] if len(row) > position else ""
+            for row in islice(rows, 1, None)]
+
+    def append_rows(self, worksheet_name, rows):
+        """
+        Appends rows and keeps the cached snapshot up to date. Nobody
+        may download the worksheet between the two (its snapshot would
+        have the rows already, and get them twice), so both are done
+        while holding the refresh lock.
+        """
+        with self.cache.refreshing(worksheet_name):
+            try:
+                self.storage.append_rows(worksheet_name, rows)
+            except Exception:
+                # The write may or may not have landed, download it again
+                self.cache.invalidate(worksheet_name)
+                raise
+            self.cache.append_rows(worksheet_name, rows)
+
+    def set_column_values(self, worksheet_name, column_name, values):
+        """Writes a whole column and drops the cached snapshot."""
+        try:
+            self.storage.set_column_values(worksheet_name, column_name, values)
+        finally:
+            self.cache.invalidate(worksheet_name)
+
+    def partition_by_month(self):
+        """
+        Partitions the worksheets by month and drops all snapshots. The
+        refresh lock of both worksheets is held throughout, so the rows
+        other sessions of the host store meanwhile wait, instead of
+        being cleared from the main worksheets with the rows moved.
+        """
+        with ExitStack() as locks:
+            for worksheet_name in WORKSHEET_HEADERS:
+                locks.enter_context(self.cache.refreshing(worksheet_name))
+            try:
+                return self.storage.partition_by_month()
+            finally:
+                self.cache.invalidate()
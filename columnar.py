@@ -0,0 +1,240 @@
+"""
+Columnar (NumPy) analytics for the CommunityFinances App.
+
+A worksheet snapshot is turned once into parallel arrays: a month code
+(0-11), a category code and the amount in cents per row. Monthly totals
+and the expenses per month and category are then NumPy reductions
+(bincount) instead of Python loops over the rows, and the amounts of
+each month (and category) reach their quantile sketches in one batch.
+
+NumPy is optional: without it, build_finance_aggregate() uses the
+row-by-row FinanceAggregate instead, with the same results. It is only
+imported by the first aggregate built (load_numpy()), as it would take
+about half of the app's start-up time.
+"""
+from aggregates import (
+    FinanceAggregate, MONTH_NAMES, row_amount_cents,
+    INCOME_AMOUNT_COLUMN, INCOME_CENTS_COLUMN,
+    EXPENSE_AMOUNT_COLUMN, EXPENSE_CATEGORY_COLUMN, EXPENSE_CENTS_COLUMN)
+
+
+MONTH_CODES = {month: code for code, month in enumerate(MONTH_NAMES)}
+
+# The numpy module once load_numpy() has imported it
+numpy = None
+# Whether load_numpy() found NumPy missing
+_numpy_missing = False
+
+
+def load_numpy():
+    """Imports NumPy on first use. Returns it, or None if not installed."""
+    global numpy, _numpy_missing
+    if numpy is None and not _numpy_missing:
+        try:
+            import numpy as module
+        except ImportError:
+            _numpy_missing = True
+        else:
+            numpy = module
+    return numpy
+
+
+class ColumnarSnapshot:
+    """
+    Month code, category code and amount (cents) arrays of the rows of a
+    worksheet snapshot that belong to a month. Rows whose amount cannot
+    be read count for the month (valid is False) but not for the sums.
+    """
+
+    def __init__(self, month_codes, amounts_cents, valid, category_codes,
+                 categories, invalid_rows):
+        self.month_codes = month_codes
+        self.amounts_cents = amounts_cents
+        self.valid = valid
+        self.category_codes = category_codes
+        # Category names, indexed by category code
+        self.categories = categories
+        # (month code, row) of the rows whose amount could not be read
+        self.invalid_rows = invalid_rows
+
+    @classmethod
+    def from_rows(cls, rows, amount_column, cents_column,
+                  category_column=None):
+        """
+        Builds the arrays of a snapshot. Rows that all have an integer
+        amount_cents take a vectorized path; any other snapshot (e.g.
+        rows not backfilled yet) is read row by row.
+        """
+        all_codes = [
+            MONTH_CODES.get(row[0].lower(), -1) if row else -1
+            for row in rows]
+        month_rows = [
+            row for row, code in zip(rows, all_codes) if code >= 0]
+        try:
+            amounts_cents = numpy.array(
+                [row[cents_column] for row in month_rows]).astype(numpy.int64)
+        except (ValueError, IndexError, TypeError):
+            return cls._from_rows_one_by_one(
+                month_rows, amount_column, cents_column, category_column)
+
+        month_codes = numpy.array(all_codes, dtype=numpy.int64)
+        month_codes = month_codes[month_codes >= 0]
+        valid = numpy.ones(len(month_rows), dtype=bool)
+        categories = []
+        category_codes = numpy.zeros(len(month_rows), dtype=numpy.int64)
+        if category_column is not None:
+            # Code the category strings as entered, then merge the codes
+            # of the same title-cased category ("food" and "Food")
+            raw_index = {}
+            raw_codes = numpy.array([
+                raw_index.setdefault(row[category_column], len(raw_index))
+                for row in month_rows], dtype=numpy.int64)
+            category_index = {}
+            title_codes = numpy.array([
+                category_index.setdefault(raw.title(), len(category_index))
+                for raw in raw_index], dtype=numpy.int64)
+            if len(raw_codes):
+                category_codes = title_codes[raw_codes]
+            categories = list(category_index)
+        return cls(
+            month_codes, amounts_cents, valid, category_codes, categories, [])
+
+    @classmethod
+    def _from_rows_one_by_one(cls, rows, amount_column, cents_column,
+                              category_column):
+        """Builds the arrays with a Python loop over the month rows."""
+        month_codes = []
+        amounts_cents = []
+        valid = []
+        category_codes = []
+        category_index = {}
+        invalid_rows = []
+        for row in rows:
+            month_code = MONTH_CODES[row[0].lower()]
+            try:
+                amount = row_amount_cents(row, amount_column, cents_column)
+                is_valid = True
+            except (ValueError, IndexError):
+                invalid_rows.append((month_code, row))
+                amount = 0
+                is_valid = False
+            month_codes.append(month_code)
+            amounts_cents.append(amount)
+            valid.append(is_valid)
+            if category_column is not None:
+                # Normalize category input to title
+                category = row[category_column].title() if is_valid else ""
+                category_codes.append(
+                    category_index.setdefault(category, len(category_index)))
+        return cls(
+            numpy.array(month_codes, dtype=numpy.int64),
+            numpy.array(amounts_cents, dtype=numpy.int64),
+            numpy.array(valid, dtype=bool),
+            numpy.array(category_codes, dtype=numpy.int64),
+            list(category_index), invalid_rows)
+
+    def row_counts_by_month(self):
+        """Number of rows of each month (12 values)."""
+        return numpy.bincount(self.month_codes, minlength=12)
+
+    def totals_by_month(self):
+        """Sum of the valid amounts of each month, in cents (12 values)."""
+        return numpy.bincount(
+            self.month_codes[self.valid],
+            weights=self.amounts_cents[self.valid],
+            minlength=12).round().astype(numpy.int64)
+
+    def totals_by_month_and_category(self):
+        """
+        Returns (month codes, category codes, cents) of every month and
+        category combination found, in order of first appearance.
+        """
+        category_count = max(len(self.categories), 1)
+        combined = (
+            self.month_codes[self.valid] * category_count +
+            self.category_codes[self.valid])
+        sums = numpy.bincount(
+            combined, weights=self.amounts_cents[self.valid],
+            minlength=12 * category_count).round().astype(numpy.int64)
+        found, first_seen = numpy.unique(combined, return_index=True)
+        found = found[numpy.argsort(first_seen)]
+        return found // category_count, found % category_count, sums[found]
+
+    def _grouped_amounts(self, keys):
+        """Yields (key, valid amounts in cents) of every key found."""
+        keys = keys[self.valid]
+        order = numpy.argsort(keys, kind="stable")
+        keys = keys[order]
+        amounts_cents = self.amounts_cents[self.valid][order]
+        found, starts = numpy.unique(keys, return_index=True)
+        for key, amounts in zip(
+                found.tolist(), numpy.split(amounts_cents, starts[1:])):
+            yield key, amounts
+
+    def amounts_by_month(self):
+        """Yields (month code, valid amounts in cents) of every month."""
+        return self._grouped_amounts(self.month_codes)
+
+    def amounts_by_month_and_category(self):
+        """
+        Yields (month code, category code, valid amounts in cents) of
+        every month and category combination found.
+        """
+        category_count = max(len(self.categories), 1)
+        for key, amounts in self._grouped_amounts(
+                self.month_codes * category_count + self.category_codes):
+            yield key // category_count, key % category_count, amounts
+
+
+def aggregate_columns(income_columns, expense_columns):
+    """Fills a FinanceAggregate from the columnar snapshots."""
+    aggregate = FinanceAggregate()
+    summaries = [aggregate.months[month] for month in MONTH_NAMES]
+
+    income_counts = income_columns.row_counts_by_month()
+    income_totals = income_columns.totals_by_month()
+    expense_counts = expense_columns.row_counts_by_month()
+    expense_totals = expense_columns.totals_by_month()
+    for code, summary in enumerate(summaries):
+        summary.has_income = bool(income_counts[code])
+        summary.total_income_cents = int(income_totals[code])
+        summary.has_expenses = bool(expense_counts[code])
+        summary.total_expenses_cents = int(expense_totals[code])
+
+    months, categories, sums = (
+        expense_columns.totals_by_month_and_category())
+    for month_code, category_code, cents in zip(
+            months.tolist(), categories.tolist(), sums.tolist()):
+        category = expense_columns.categories[category_code]
+        summaries[month_code].expenses_by_category[category] = cents
+
+    for month_code, amounts in income_columns.amounts_by_month():
+        summaries[month_code].income_sketch.add_many(amounts.tolist())
+    for month_code, category_code, amounts in (
+            expense_columns.amounts_by_month_and_category()):
+        category = expense_columns.categories[category_code]
+        summaries[month_code].expense_sketch(category).add_many(
+            amounts.tolist())
+
+    for month_code, row in (
+            income_columns.invalid_rows + expense_columns.invalid_rows):
+        summaries[month_code].invalid_rows.append(row)
+    return aggregate
+
+
+def build_finance_aggregate(income_rows, expense_rows):
+    """
+    Builds the monthly aggregates of full worksheet snapshots, with NumPy
+    reductions when NumPy is installed and row loops otherwise.
+    """
+    if load_numpy() is None:
+        return FinanceAggregate.from_rows(income_rows, expense_rows)
+    aggregate = aggregate_columns(
+        ColumnarSnapshot.from_rows(
+            income_rows, INCOME_AMOUNT_COLUMN, INCOME_CENTS_COLUMN),
+        ColumnarSnapshot.from_rows(
+            expense_rows, EXPENSE_AMOUNT_COLUMN, EXPENSE_CENTS_COLUMN,
+            EXPENSE_CATEGORY_COLUMN))
+    aggregate.income_row_count = len(income_rows)
+    aggregate.expense_row_count = len(expense_rows)
+    return aggregate
@@ -1,13 +1,187 @@
 const Pty = require('node-pty');
 const fs = require('fs');
 
+// Warm worker pool (see pool_worker.py). PYTHON_POOL_SIZE=0 disables it
+// and every websocket spawns a fresh "python3 run.py" as before. Busy
+// workers count towards the pool size: while all of them are in a
+// session, new visitors get a fresh "python3 run.py".
+const POOL_SIZE = parseInt(process.env.PYTHON_POOL_SIZE || '0');
+const POOL_MAX_SESSIONS = parseInt(process.env.PYTHON_POOL_MAX_SESSIONS || '20');
+const POOL_HEALTH_INTERVAL = parseInt(process.env.PYTHON_POOL_HEALTH_INTERVAL || '30000');
+
+// Must match the markers in pool_worker.py
+const POOL_READY_MARKER = '\x1b]9;finances-pool-ready\x07';
+const POOL_SESSION_MARKER = '\x1b]9;finances-pool-session\x07';
+const POOL_PONG_MARKER = '\x1b]9;finances-pool-pong\x07';
+
+var workers = [];
+
 exports.install = function () {
 
     ROUTE('/');
     WEBSOCKET('/', socket, ['raw']);
 
+    if (POOL_SIZE > 0) {
+        fillPool();
+        setInterval(checkPoolHealth, POOL_HEALTH_INTERVAL);
+    }
+
 };
 
+function spawnTerminal(script) {
+    return Pty.spawn('python3', [script], {
+        name: 'xterm-color',
+        cols: 80,
+        rows: 24,
+        cwd: process.env.PWD,
+        env: process.env
+    });
+}
+
+function countWorkers(states) {
+    return workers.filter(function (worker) {
+        return states.indexOf(worker.state) !== -1;
+    }).length;
+}
+
+function fillPool() {
+    // Keep POOL_SIZE workers, busy or warm (or warming up)
+    while (countWorkers(['starting', 'idle', 'handover', 'busy']) < POOL_SIZE)
+        spawnWorker();
+}
+
+function spawnWorker() {
+
+    var worker = {
+        tty: spawnTerminal('pool_worker.py'),
+        state: 'starting',
+        sessions: 0,
+        client: null,
+        output: '',
+        lastPong: Date.now()
+    };
+
+    worker.tty.on('data', function (data) {
+        onWorkerData(worker, data);
+    });
+
+    worker.tty.on('exit', function () {
+        removeWorker(worker);
+        if (worker.client) {
+            worker.client.tty = null;
+            worker.client.close();
+        }
+        // Wait a little, so a worker that cannot start does not spin
+        setTimeout(fillPool, 1000);
+    });
+
+    workers.push(worker);
+}
+
+function removeWorker(worker) {
+    var index = workers.indexOf(worker);
+    if (index !== -1)
+        workers.splice(index, 1);
+    worker.state = 'stopped';
+}
+
+function recycleWorker(worker) {
+    removeWorker(worker);
+    worker.tty.kill(9);
+}
+
+// Length of the end of data that could be the start of a marker
+function partialMarkerLength(data, marker) {
+    for (var length = Math.min(marker.length - 1, data.length); length > 0; length--) {
+        if (data.endsWith(marker.slice(0, length)))
+            return length;
+    }
+    return 0;
+}
+
+function onWorkerData(worker, data) {
+
+    if (worker.state === 'busy') {
+        // A marker can be split across chunks: the start of one is held back
+        data = worker.output + data;
+        worker.output = '';
+        var end = data.indexOf(POOL_READY_MARKER);
+        if (end === -1) {
+            var held = partialMarkerLength(data, POOL_READY_MARKER);
+            worker.output = data.slice(data.length - held);
+            if (held < data.length)
+                worker.client.send(data.slice(0, data.length - held));
+            return;
+        }
+        // The visitor exited the program, the worker is free again
+        if (end > 0)
+            worker.client.send(data.slice(0, end));
+        finishSession(worker);
+        return;
+    }
+
+    if (worker.state === 'handover') {
+        // Drop everything (e.g. the echoed START) until the session begins
+        worker.output += data;
+        var start = worker.output.indexOf(POOL_SESSION_MARKER);
+        if (start !== -1) {
+            var rest = worker.output.slice(start + POOL_SESSION_MARKER.length);
+            worker.output = '';
+            worker.state = 'busy';
+            if (rest)
+                onWorkerData(worker, rest);
+        }
+        return;
+    }
+
+    // Starting or idle: only the markers matter
+    if (data.indexOf(POOL_PONG_MARKER) !== -1)
+        worker.lastPong = Date.now();
+    if (worker.state === 'starting' && data.indexOf(POOL_READY_MARKER) !== -1) {
+        worker.state = 'idle';
+        worker.lastPong = Date.now();
+    }
+}
+
+function finishSession(worker) {
+    var client = worker.client;
+    worker.client = null;
+    worker.sessions++;
+    client.tty = null;
+    client.close();
+
+    if (worker.sessions >= POOL_MAX_SESSIONS) {
+        recycleWorker(worker);
+        fillPool();
+    } else {
+        // Back in the pool, for the next visitor
+        worker.state = 'idle';
+        worker.lastPong = Date.now();
+    }
+}
+
+function takeIdleWorker() {
+    for (var i = 0; i < workers.length; i++) {
+        if (workers[i].state === 'idle')
+            return workers[i];
+    }
+    return null;
+}
+
+function checkPoolHealth() {
+    workers.slice().forEach(function (worker) {
+        if (worker.state !== 'idle')
+            return;
+        if (Date.now() - worker.lastPong > 2 * POOL_HEALTH_INTERVAL) {
+            console.log('Pool worker not responding, replacing it');
+            recycleWorker(worker);
+            return;
+        }
+        worker.tty.write('PING\r');
+    });
+    fillPool();
+}
+
 function socket() {
 
     this.encodedecode = false;
@@ -15,14 +189,20 @@ function socket() {
 
     this.on('open', function (client) {
 
+        var worker = POOL_SIZE > 0 ? takeIdleWorker() : null;
+
+        if (worker) {
+            // Hand a warm worker to this visitor
+            worker.state = 'handover';
+            worker.client = client;
+            client.tty = worker.tty;
+            client.worker = worker;
+            worker.tty.write('START\r');
+            return;
+        }
+
         // Spawn terminal
-        client.tty = Pty.spawn('python3', ['run.py'], {
-            name: 'xterm-color',
-            cols: 80,
-            rows: 24,
-            cwd: process.env.PWD,
-            env: process.env
-        });
+        client.tty = spawnTerminal('run.py');
 
         client.tty.on('exit', function (code, signal) {
             client.tty = null;
@@ -37,6 +217,18 @@ function socket() {
     });
 
     this.on('close', function (client) {
+        if (client.worker) {
+            // Closed in the middle of a session: do not reuse the worker
+            if (client.worker.client === client) {
+                client.worker.client = null;
+                recycleWorker(client.worker);
+                fillPool();
+                console.log("Pool worker killed and terminal unloaded");
+            }
+            client.worker = null;
+            client.tty = null;
+            return;
+        }
         if (client.tty) {
             client.tty.kill(9);
             client.tty = null;
@@ -57,4 +249,4 @@ if (process.env.CREDS != null) {
             socket.emit("console_output", "Error saving credentials: " + err);
         }
     });
-}
\ No newline at end of file
+}
@@ -0,0 +1,37 @@
+"""
+Columnar snapshot export for the CommunityFinances App.
+
+Run from the project folder, against the storage backend configured with
+FINANCES_STORAGE (see storage.py), with pyarrow installed:
+
+    python3 export_snapshot.py [DIRECTORY]
+
+Writes the incomes and expenses worksheets to DIRECTORY/incomes.arrow
+and DIRECTORY/expenses.arrow (default: snapshot/), see arrow_snapshot.py.
+Each worksheet is downloaded once, whatever the number of analysts
+reading the files afterwards.
+"""
+import sys
+
+from arrow_snapshot import DEFAULT_SNAPSHOT_DIR, export_snapshot
+from storage import create_storage
+
+
+def main(args):
+    """Runs the export to the directory named on the command line."""
+    if len(args) > 1:
+        print(__doc__)
+        return 1
+    directory = args[0] if args else DEFAULT_SNAPSHOT_DIR
+    try:
+        written = export_snapshot(create_storage(), directory)
+    except ImportError as error:
+        print(error)
+        return 1
+    for worksheet_name, count in written.items():
+        print(f"{worksheet_name}: {count} row(s) written to {directory}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,202 @@
+"""
+Write-ahead journal for the CommunityFinances App.
+
+Every new income/expense row is written to a local JSON-lines journal
+(and synced to disk) before it is handed to the write buffer, together
+with an idempotency key that is also stored in the row's entry_id
+column. If the session ends before its rows reach the sheet (Sheets API
+errors, the terminal killed on websocket close), the next session
+replays the journal: rows whose entry_id is not in the sheet yet are
+stored again, so nothing is lost and nothing is stored twice.
+
+Each process writes its own journal file in FINANCES_JOURNAL_DIR and
+holds a lock on it; a file nobody holds a lock on belongs to a session
+that has ended. The journal is emptied once all its rows are stored.
+"""
+import json
+import os
+import secrets
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows: journals are still written, but any
+    # other journal file is taken to belong to an ended session
+    fcntl = None
+
+from schema import ENTRY_ID_COLUMN, WORKSHEET_HEADERS
+from storage_wrapper import StorageWrapper
+
+
+DEFAULT_JOURNAL_DIR = "journal"
+
+
+def new_entry_id():
+    """Returns a new idempotency key for a row."""
+    return secrets.token_hex(8)
+
+
+class WriteAheadJournal:
+    """The journal file of this process, in a directory of journals."""
+
+    def __init__(self, directory=DEFAULT_JOURNAL_DIR):
+        self.directory = directory
+        # A random part too: the PID of an ended session can be reused,
+        # and its journal must be replayed, not taken over
+        self.path = os.path.join(
+            directory, f"{os.getpid()}-{secrets.token_hex(4)}.jsonl")
+        self._file = None
+        # Journals of ended sessions being replayed: path -> locked file
+        self._claimed = {}
+
+    def _open(self):
+        """Creates and locks the journal file of this process."""
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+            if fcntl is not None:
+                fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return self._file
+
+    def record(self, worksheet_name, row):
+        """Appends a row to the journal and syncs it to disk."""
+        self.record_rows(worksheet_name, [row])
+
+    def record_rows(self, worksheet_name, rows):
+        """Appends rows to the journal, with a single sync to disk."""
+        journal_file = self._open()
+        journal_file.write("".join(
+            json.dumps({"worksheet": worksheet_name, "row": row}) + "\n"
+            for row in rows))
+        journal_file.flush()
+        os.fsync(journal_file.fileno())
+
+    def clear(self):
+        """Empties the journal, once all its rows are stored."""
+        if self._file is not None:
+            self._file.truncate(0)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def _claim(self, path):
+        """
+        Locks the journal of another process, unless a running session
+        (its owner, or another one replaying it) holds the lock.
+        Returns the open file, or None.
+        """
+        journal_file = open(path, encoding="utf-8")
+        if fcntl is not None:
+            try:
+                fcntl.flock(journal_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                journal_file.close()
+                return None
+        self._claimed[path] = journal_file
+        return journal_file
+
+    def abandoned_journals(self):
+        """
+        Claims the journals of sessions that have ended and returns
+        {path: [(worksheet name, row), ...]}, skipping a last line cut
+        short. They are kept locked until remove_abandoned_journals().
+        """
+        if not os.path.isdir(self.directory):
+            return {}
+        journals = {}
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if not name.endswith(".jsonl") or path == self.path:
+                continue
+            journal_file = self._claim(path)
+            if journal_file is None:
+                continue
+            entries = []
+            for line in journal_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Killed in the middle of writing this line, so the
+                    # row was never handed on: nothing to replay
+                    continue
+                entries.append((entry["worksheet"], entry["row"]))
+            journals[path] = entries
+        return journals
+
+    def remove_abandoned_journals(self):
+        """Deletes the claimed journals, once their rows are replayed."""
+        for path, journal_file in self._claimed.items():
+            os.remove(path)
+            journal_file.close()
+        self._claimed = {}
+
+
+class JournaledStorage(StorageWrapper):
+    """
+    Wraps the buffered storage: rows appended through it get an
+    entry_id and are journaled first. The journal is emptied when
+    drain() confirms every row is stored.
+    """
+
+    def __init__(self, storage, journal=None):
+        super().__init__(storage)
+        self.journal = journal if journal is not None else WriteAheadJournal()
+
+    def append_row(self, worksheet_name, row, entry_id=None):
+        """Journals a row, with its entry_id, then hands it on."""
+        entry_column = WORKSHEET_HEADERS[worksheet_name].index(
+            ENTRY_ID_COLUMN)
+        row = list(row) + [""] * (entry_column - len(row))
+        row[entry_column:] = [entry_id or new_entry_id()]
+        self.journal.record(worksheet_name, row)
+        self.storage.append_row(worksheet_name, row)
+
+    def append_rows(self, worksheet_name, rows):
+        """
+        Journals rows, each with a new entry_id, with one sync to disk,
+        then hands them on together.
+        """
+        entry_column = WORKSHEET_HEADERS[worksheet_name].index(
+            ENTRY_ID_COLUMN)
+        rows = [
+            list(row[:entry_column]) + [""] * (entry_column - len(row)) +
+            [new_entry_id()]
+            for row in rows]
+        self.journal.record_rows(worksheet_name, rows)
+        self.storage.append_rows(worksheet_name, rows)
+
+    def drain(self, timeout=None):
+        """
+        Waits (at most timeout seconds) until every row is stored and
+        then empties the journal. Returns True if every row is stored.
+        """
+        stored = self.storage.drain(timeout)
+        if stored:
+            self.journal.clear()
+        return stored
+
+    def replay(self):
+        """
+        Stores the rows left in the journals of ended sessions that are
+        not in the sheet yet, journaling them again first. Returns the
+        number of rows replayed.
+        """
+        journals = self.journal.abandoned_journals()
+        entries = [entry for rows in journals.values() for entry in rows]
+        entry_column = {
+            name: header.index(ENTRY_ID_COLUMN)
+            for name, header in WORKSHEET_HEADERS.items()}
+        stored_ids = {
+            name: set(self.storage.get_column_values(name, ENTRY_ID_COLUMN))
+            for name in {worksheet_name for worksheet_name, _ in entries}}
+        replayed = 0
+        for worksheet_name, row in entries:
+            entry_id = row[entry_column[worksheet_name]]
+            if entry_id not in stored_ids[worksheet_name]:
+                stored_ids[worksheet_name].add(entry_id)
+                self.append_row(
+                    worksheet_name, row[:entry_column[worksheet_name]],
+                    entry_id)
+                replayed += 1
+        # The rows are in this session's journal now
+        self.journal.remove_abandoned_journals()
+        return replayed
@@ -0,0 +1,102 @@
+"""
+Data migrations for the CommunityFinances App.
+
+Run from the project folder, against the storage backend configured with
+FINANCES_STORAGE (see storage.py):
+
+    python3 migrate.py backfill-cents
+    python3 migrate.py partition-months
+    python3 migrate.py regenerate-reports
+
+backfill-cents    fills the amount_cents column of the rows stored
+                  before it existed, from their EU-formatted amount.
+partition-months  moves the rows of each month of the Google Sheet to a
+                  worksheet of their own (e.g. expenses_january), so a
+                  monthly report only downloads that month. Run it
+                  offline, with no app session running: a session
+                  keeps writing to the main worksheets until it is
+                  restarted, and its reports may count rows twice
+                  while the rows are being moved.
+regenerate-reports
+                  rebuilds the materialized report of every month (the
+                  reports worksheet), e.g. after rows were entered in
+                  the Google Sheet by hand.
+"""
+import sys
+
+from amounts import parse_stored_amount_cents, read_cents
+from schema import AMOUNT_CENTS_COLUMN, WORKSHEET_HEADERS
+from storage import create_storage
+
+
+def backfill_amount_cents(storage):
+    """
+    Fills the missing amount_cents cells of every worksheet, with one
+    column write per worksheet. Returns the number of cells filled.
+    """
+    filled = 0
+    for worksheet_name, header in WORKSHEET_HEADERS.items():
+        amount_column = header.index("amount")
+        cents_column = header.index(AMOUNT_CENTS_COLUMN)
+        rows = storage.get_all_rows(worksheet_name)[1:]
+
+        values = []
+        missing = 0
+        for row in rows:
+            cents = row[cents_column] if len(row) > cents_column else None
+            try:
+                if cents in ("", None):
+                    cents = parse_stored_amount_cents(row[amount_column])
+                    missing += 1
+                else:
+                    # Rewritten as a number, not as the text it was read as
+                    cents = read_cents(cents)
+            except (ValueError, IndexError):
+                # Left as it is: the reports flag this row as invalid
+                cents = "" if cents is None else cents
+            values.append(cents)
+
+        if missing:
+            storage.set_column_values(
+                worksheet_name, AMOUNT_CENTS_COLUMN, values)
+        print(f"{worksheet_name}: {missing} amount_cents cell(s) filled")
+        filled += missing
+    return filled
+
+
+def partition_by_month(storage):
+    """
+    Partitions the worksheets by month (a no-op on SQLite, which reads
+    months through its month index). Returns the number of rows moved.
+    """
+    moved = storage.partition_by_month()
+    print(f"{moved} row(s) moved to the month worksheets")
+    return moved
+
+
+def regenerate_reports(storage):
+    """
+    Rebuilds the materialized monthly reports from the worksheets.
+    Returns the number of reports written.
+    """
+    written = storage.regenerate_reports()
+    print(f"{written} monthly report(s) written")
+    return written
+
+
+def main(args):
+    """Runs the migration named on the command line."""
+    migrations = {
+        "backfill-cents": backfill_amount_cents,
+        "partition-months": partition_by_month,
+        "regenerate-reports": regenerate_reports,
+    }
+    if len(args) != 1 or args[0] not in migrations:
+        print(__doc__)
+        return 1
+    migrations[args[0]](create_storage())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,43 @@
+"""
+Paged reading of a worksheet for the "view all" screen of the
+CommunityFinances App.
+
+Each page is one range read of the storage (e.g. A2:E51 on the Google
+Sheet) instead of a download of the whole worksheet, so the first rows
+show up straight away and only one page is held in memory. The month
+column is only read when the user jumps to a month.
+"""
+DEFAULT_PAGE_ROWS = 50
+
+
+class WorksheetPages:
+    """Pages of page_rows data rows of one worksheet, in sheet order."""
+
+    def __init__(self, storage, worksheet_name, page_rows=DEFAULT_PAGE_ROWS):
+        self.storage = storage
+        self.worksheet_name = worksheet_name
+        self.page_rows = max(page_rows, 1)
+        # Month cell of every data row, read on the first jump
+        self._months = None
+
+    def page(self, number):
+        """
+        Returns (rows, has_next_page) of page number (0 is the first).
+        One row more than a page is read to know whether another follows.
+        """
+        rows = self.storage.get_rows(
+            self.worksheet_name, number * self.page_rows, self.page_rows + 1)
+        return rows[:self.page_rows], len(rows) > self.page_rows
+
+    def page_of_month(self, month):
+        """
+        Returns the number of the first page holding a row of month (any
+        case), or None if the worksheet has no row for it.
+        """
+        if self._months is None:
+            self._months = self.storage.get_column_values(
+                self.worksheet_name, "month")
+        for position, value in enumerate(self._months):
+            if str(value).strip().lower() == month.lower():
+                return position // self.page_rows
+        return None
@@ -0,0 +1,79 @@
+"""
+Pre-forked ("warm") worker for the CommunityFinances App.
+
+controllers/default.js can keep a pool of these workers running (see
+PYTHON_POOL_SIZE). Each worker imports the app, authorizes with Google
+and looks up the worksheets once, then waits on its terminal for the
+supervisor's commands:
+
+    START  run one app session (welcome message, menu, ...) right away.
+    PING   health check, answered with POOL_PONG_MARKER.
+
+The markers below are printed as OSC escape sequences, which terminals
+ignore, and the supervisor strips them before forwarding any output.
+After a session ends the worker prints POOL_READY_MARKER again and can
+be handed to the next visitor with the same authenticated client.
+"""
+import importlib
+import sys
+
+import run
+
+
+POOL_READY_MARKER = "\x1b]9;finances-pool-ready\x07"
+POOL_SESSION_MARKER = "\x1b]9;finances-pool-session\x07"
+POOL_PONG_MARKER = "\x1b]9;finances-pool-pong\x07"
+
+
+def send_marker(marker):
+    """Prints a marker for the supervisor, after any pending app output."""
+    sys.stdout.flush()
+    # Bypasses colorama's wrapper, which could strip escape sequences
+    sys.__stdout__.write(marker + "\n")
+    sys.__stdout__.flush()
+
+
+def warm_up():
+    """Does the slow start-up work before any visitor is waiting."""
+    # Deferred in run.py for cold starts, imported up front here
+    importlib.import_module("tabulate")
+
+    try:
+        run.STORAGE.connect()
+    except Exception as error:
+        # Sessions will connect on first use instead
+        print(f"Could not connect ahead of time: {error}", file=sys.stderr)
+
+
+def run_session():
+    """Runs one app session until the visitor exits the program."""
+    # API calls are counted per session, not per worker
+    run.STORAGE.api_calls.clear()
+    run.STORAGE.api_metrics.clear()
+    send_marker(POOL_SESSION_MARKER)
+    try:
+        run.main()
+    except SystemExit:
+        # exit_program() ends the session, not the worker
+        pass
+
+
+def serve():
+    """Waits for supervisor commands until the terminal is closed."""
+    warm_up()
+    send_marker(POOL_READY_MARKER)
+    while True:
+        line = sys.stdin.readline()
+        if not line:
+            # Terminal closed by the supervisor
+            return
+        command = line.strip().upper()
+        if command == "PING":
+            send_marker(POOL_PONG_MARKER)
+        elif command == "START":
+            run_session()
+            send_marker(POOL_READY_MARKER)
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,130 @@
+"""
+Materialized monthly reports for the CommunityFinances App.
+
+The MonthSummary of every month (totals, expenses per category, rows
+that could not be read, sketches of the amounts) is kept in a reports
+worksheet (a table on
+SQLite), one row per month. Serving a monthly report is then a single
+read of one row. ReportingStorage refreshes the report of a month each
+time rows of that month are stored, and regenerate_reports() rebuilds
+all 12 months at once:
+
+    python3 migrate.py regenerate-reports
+
+Refreshes hold the refresh lock of the reports worksheet, shared by the
+sessions of the host (see shared_cache.py), so a report computed before
+another session's rows were stored never overwrites a newer one. Rows
+entered straight in the Google Sheet (not through the app) are only
+taken into account by the next regeneration.
+
+The summaries of months without a report come from get_month_summaries(),
+from the aggregates of the whole worksheets that ReportingStorage keeps
+up to date with the rows it stores; the app keeps none of its own.
+"""
+from aggregates import FinanceAggregate, MonthSummary
+from columnar import build_finance_aggregate
+from schema import MONTH_NAMES, REPORTS_WORKSHEET
+from storage_wrapper import StorageWrapper
+
+
+class ReportingStorage(StorageWrapper):
+    """
+    Wraps the (cached) storage and refreshes the materialized report of
+    every month that rows are stored for.
+    """
+
+    def __init__(self, storage):
+        super().__init__(storage)
+        # Error of the last report refresh that failed, if any
+        self.last_refresh_error = None
+        # Monthly aggregates of the whole worksheets, built on first use
+        # and then kept up to date with the rows appended
+        self._aggregate = None
+
+    def append_rows(self, worksheet_name, rows):
+        """Appends rows and refreshes the reports of their months."""
+        self.storage.append_rows(worksheet_name, rows)
+        if self._aggregate is not None:
+            if worksheet_name == "incomes":
+                self._aggregate.add_income_rows(rows)
+            else:
+                self._aggregate.add_expense_rows(rows)
+        months = []
+        for row in rows:
+            month = str(row[0]).lower() if row else ""
+            if month in MONTH_NAMES and month not in months:
+                months.append(month)
+        if not months:
+            return
+        try:
+            # One session at a time reads, computes and writes reports,
+            # so an older computation never overwrites a newer one
+            with self.storage.refreshing(REPORTS_WORKSHEET):
+                self._store_reports(self.get_month_summaries(months))
+            self.last_refresh_error = None
+        except Exception as error:
+            # The rows are stored, so the write must not be retried;
+            # "regenerate-reports" repairs the reports left behind
+            self.last_refresh_error = error
+
+    def get_month_summaries(self, months):
+        """
+        Returns {month: MonthSummary} of some months (lowercase names)
+        from the stored rows: from their own rows when the storage reads
+        single months, else from the aggregates of the whole worksheets.
+        The aggregates are only rebuilt (one pass over each worksheet)
+        when the worksheets also changed some other way.
+        """
+        if (self.storage.supports_month_reads() and
+                len(months) < len(MONTH_NAMES)):
+            aggregate = FinanceAggregate()
+            for month in months:
+                aggregate.add_income_rows(
+                    self.storage.get_month_rows("incomes", month))
+                aggregate.add_expense_rows(
+                    self.storage.get_month_rows("expenses", month))
+            return {month: aggregate.month(month) for month in months}
+        income_rows = self.storage.get_all_rows("incomes")
+        expense_rows = self.storage.get_all_rows("expenses")
+        if (self._aggregate is None or
+                self._aggregate.is_stale(income_rows, expense_rows)):
+            self._aggregate = build_finance_aggregate(
+                income_rows, expense_rows)
+        return {month: self._aggregate.month(month) for month in months}
+
+    def _store_reports(self, summaries):
+        """Writes the report rows of {month: MonthSummary}."""
+        self.storage.set_report_rows([
+            summary.to_report_row(month)
+            for month, summary in summaries.items()])
+
+    def get_report(self, month):
+        """Returns the materialized MonthSummary of a month, or None."""
+        row = self.storage.get_report_row(month)
+        if row is None:
+            return None
+        return MonthSummary.from_report_row(row)
+
+    def get_reports(self):
+        """
+        Returns {lowercase month: MonthSummary} of the months that have a
+        materialized report, with one read.
+        """
+        return {
+            str(row[0]).lower(): MonthSummary.from_report_row(row)
+            for row in self.storage.get_report_rows()}
+
+    def regenerate_reports(self):
+        """
+        Rebuilds the aggregates and the reports of all 12 months from the
+        worksheets, with one read of each worksheet and one write.
+        Returns the number of reports written.
+        """
+        with self.storage.refreshing(REPORTS_WORKSHEET):
+            self._aggregate = build_finance_aggregate(
+                self.storage.get_all_rows("incomes"),
+                self.storage.get_all_rows("expenses"))
+            self._store_reports({
+                month: self._aggregate.month(month)
+                for month in MONTH_NAMES})
+        return len(MONTH_NAMES)
@@ -0,0 +1,272 @@
+"""
+Compact worksheet snapshots for the CommunityFinances App.
+
+A snapshot from get_all_values() is a list of lists of strings: every
+row costs a list plus one string object per cell, although months,
+categories and many amounts repeat thousands of times. CompactRows keeps
+the same rows as parallel array columns instead:
+
+    month, category       small integer codes (array 'H') into a table
+                          that starts with the 12 months / CATEGORIES.
+    amount_cents          64-bit integers (array 'q').
+    amount                nothing, when the cell is amount_cents in the
+                          display format; an interned value otherwise.
+    entry_id              a plain list: every row has its own value, so
+                          interning would only add a table entry each.
+    anything else         integer codes (array 'I') into a table of
+                          interned values (source, description).
+
+It still behaves like the list of rows it replaces (len, indexing,
+slicing, iteration, extend), so the rest of the app does not change.
+Iterating rebuilds one row at a time; slicing rebuilds the whole slice.
+ChainedRows puts rows not stored yet after a snapshot without copying it.
+"""
+from array import array
+from itertools import chain, islice
+import sys
+
+from amounts import format_cents_for_display
+from schema import (
+    AMOUNT_CENTS_COLUMN, CATEGORIES, ENTRY_ID_COLUMN, MONTH_NAMES)
+
+
+# Typical values of the coded columns, so their codes are stable
+KNOWN_VALUES = {
+    "month": [month.title() for month in MONTH_NAMES],
+    "category": CATEGORIES,
+}
+
+# Stands for an amount cell that is its amount_cents cell, formatted
+FORMATTED_CENTS = object()
+
+
+class InternedColumn:
+    """A column of integer codes into a table of distinct values."""
+
+    def __init__(self, typecode="I", known_values=()):
+        self.codes = array(typecode)
+        self.values = []
+        self.index = {}
+        for value in known_values:
+            self.code(value)
+
+    def code(self, value):
+        """Returns the code of a value, adding it to the table if new."""
+        code = self.index.get(value)
+        if code is None:
+            if isinstance(value, str):
+                value = sys.intern(value)
+            code = len(self.values)
+            self.values.append(value)
+            self.index[value] = code
+        return code
+
+    def append(self, value):
+        """Appends a value to the column."""
+        code = self.code(value)
+        try:
+            self.codes.append(code)
+        except OverflowError:
+            # More distinct values than the small typecode can number
+            self.codes = array("I", self.codes)
+            self.codes.append(code)
+
+    def __getitem__(self, position):
+        return self.values[self.codes[position]]
+
+    def copy(self):
+        """Returns an independent copy of the column."""
+        column = InternedColumn(self.codes.typecode)
+        column.codes = array(self.codes.typecode, self.codes)
+        column.values = list(self.values)
+        column.index = dict(self.index)
+        return column
+
+
+class TextColumn(list):
+    """A column of values that rarely repeat, kept as they are."""
+
+    def copy(self):
+        """Returns an independent copy of the column."""
+        return TextColumn(self)
+
+
+class CentsColumn:
+    """A column of integer cents; other values are kept aside."""
+
+    def __init__(self):
+        self.cents = array("q")
+        # position -> value that is not an integer (None, "", text)
+        self.other_values = {}
+
+    def append(self, value):
+        """Appends a value, storing numeric strings as integers."""
+        if isinstance(value, str) and value.strip().isdigit():
+            value = int(value)
+        if isinstance(value, int) and not isinstance(value, bool):
+            try:
+                self.cents.append(value)
+                return
+            except OverflowError:
+                pass
+        self.other_values[len(self.cents)] = value
+        self.cents.append(0)
+
+    def __getitem__(self, position):
+        if position in self.other_values:
+            return self.other_values[position]
+        return self.cents[position]
+
+    def copy(self):
+        """Returns an independent copy of the column."""
+        column = CentsColumn()
+        column.cents = array("q", self.cents)
+        column.other_values = dict(self.other_values)
+        return column
+
+
+class CompactRows:
+    """The rows of a worksheet snapshot, stored column by column."""
+
+    def __init__(self, header):
+        self.header = list(header)
+        # Cells of the header row as read (unnamed columns come after)
+        self.header_width = len(self.header)
+        self.columns = [self._new_column(name) for name in self.header]
+        # Number of cells of each data row (rows can be shorter)
+        self.widths = array("B")
+        self._find_amount_columns()
+
+    def _find_amount_columns(self):
+        """Finds the display amount and amount_cents column positions."""
+        if "amount" in self.header and AMOUNT_CENTS_COLUMN in self.header:
+            self.amount_position = self.header.index("amount")
+            self.cents_position = self.header.index(AMOUNT_CENTS_COLUMN)
+        else:
+            self.amount_position = self.cents_position = None
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Builds compact rows from a list of rows, header row first."""
+        compact = cls(rows[0] if rows else [])
+        compact.extend(islice(rows, 1, None))
+        return compact
+
+    def _new_column(self, name):
+        """Creates the column storage suited to a header name."""
+        if name == AMOUNT_CENTS_COLUMN:
+            return CentsColumn()
+        if name == ENTRY_ID_COLUMN:
+            return TextColumn()
+        if name in KNOWN_VALUES:
+            return InternedColumn("H", KNOWN_VALUES[name])
+        return InternedColumn()
+
+    def append(self, row):
+        """Appends a data row."""
+        while len(row) > len(self.columns):
+            # A cell beyond the header: add an unnamed column
+            column = InternedColumn()
+            for _ in range(len(self.widths)):
+                column.append("")
+            self.header.append("")
+            self.columns.append(column)
+        cells = list(row) + [""] * (len(self.columns) - len(row))
+        if self.amount_position is not None:
+            cents = cells[self.cents_position]
+            if isinstance(cents, str) and cents.strip().isdigit():
+                # As the sheet returns it; CentsColumn keeps it as an int
+                cents = int(cents)
+            if (isinstance(cents, int) and
+                    cells[self.amount_position] ==
+                    format_cents_for_display(cents)):
+                cells[self.amount_position] = FORMATTED_CENTS
+        for column, cell in zip(self.columns, cells):
+            column.append(cell)
+        self.widths.append(len(row))
+
+    def extend(self, rows):
+        """Appends several data rows."""
+        for row in rows:
+            self.append(row)
+
+    def copy(self):
+        """Returns an independent copy of the rows."""
+        compact = CompactRows.__new__(CompactRows)
+        compact.header = list(self.header)
+        compact.header_width = self.header_width
+        compact.columns = [column.copy() for column in self.columns]
+        compact.widths = array("B", self.widths)
+        compact.amount_position = self.amount_position
+        compact.cents_position = self.cents_position
+        return compact
+
+    def __add__(self, rows):
+        """Returns a copy with rows (a list of data rows) appended."""
+        compact = self.copy()
+        compact.extend(rows)
+        return compact
+
+    def __len__(self):
+        # The header counts as a row, as in get_all_values()
+        return len(self.widths) + 1
+
+    def _row(self, position):
+        """Rebuilds data row number position as a list."""
+        row = [
+            column[position]
+            for column in self.columns[:self.widths[position]]]
+        amount_position = self.amount_position
+        if (amount_position is not None and len(row) > amount_position and
+                row[amount_position] is FORMATTED_CENTS):
+            row[amount_position] = format_cents_for_display(
+                self.columns[self.cents_position][position])
+        return row
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("row index out of range")
+        if index == 0:
+            return self.header[:self.header_width]
+        return self._row(index - 1)
+
+    def __iter__(self):
+        yield self.header[:self.header_width]
+        for position in range(len(self.widths)):
+            yield self._row(position)
+
+    def column(self, name):
+        """Returns the column storage of a header name."""
+        return self.columns[self.header.index(name)]
+
+
+class ChainedRows:
+    """
+    The rows of a snapshot followed by more rows (e.g. the ones still
+    waiting to be stored), read-only, without copying the snapshot.
+    """
+
+    def __init__(self, rows, more_rows):
+        self.rows = rows
+        self.more_rows = list(more_rows)
+
+    def __len__(self):
+        return len(self.rows) + len(self.more_rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("row index out of range")
+        if index < len(self.rows):
+            return self.rows[index]
+        return self.more_rows[index - len(self.rows)]
+
+    def __iter__(self):
+        return chain(self.rows, self.more_rows)
@@ -1,28 +1,45 @@
-from datetime import datetime
-import re
+import os
+import sys
 
 from colorama import init, Fore, Style
-import gspread
-from google.oauth2.service_account import Credentials
-from tabulate import tabulate
 
-
-SCOPE = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive.file",
-    "https://www.googleapis.com/auth/drive"
-    ]
-
-CREDS = Credentials.from_service_account_file('creds.json')
-SCOPED_CREDS = CREDS.with_scopes(SCOPE)
-GSPREAD_CLIENT = gspread.authorize(SCOPED_CREDS)
-SHEET = GSPREAD_CLIENT.open('my_finances')
-
-# List of valid expense categories
-CATEGORIES = [
-    "Housing", "Transportation", "Food", "Personal Care", "Healthcare",
-    "Entertainment", "Shopping", "Education", "Travel", "Gifts", "Other"
-]
+from aggregates import (
+    EXPENSE_AMOUNT_COLUMN, INCOME_AMOUNT_COLUMN, MonthSummary,
+    months_between)
+from amounts import format_amount_for_display, format_cents_for_display
+from pager import DEFAULT_PAGE_ROWS, WorksheetPages
+from schema import CATEGORIES, DISPLAY_COLUMNS, MONTH_NAMES
+from storage import create_storage
+from validators import (
+    expense_row, income_row, validate_amount, validate_category,
+    validate_month, validate_text)
+
+
+# Google Sheet or local SQLite database, chosen by FINANCES_STORAGE,
+# behind a snapshot cache and a write buffer. Nothing is downloaded
+# (and the Google Sheet is not even opened) until data is needed.
+STORAGE = create_storage()
+
+# Seconds the app waits on exit for the entries still being stored
+WRITE_TIMEOUT = float(os.environ.get("FINANCES_WRITE_TIMEOUT", 10))
+
+# Data rows per page of the "view all" screen
+PAGE_ROWS = int(os.environ.get("FINANCES_PAGE_ROWS", DEFAULT_PAGE_ROWS))
+
+# Directory of a columnar snapshot (see arrow_snapshot.py) to read the
+# reports from instead of the worksheets, if set
+REPORT_SNAPSHOT_DIR = os.environ.get("FINANCES_REPORT_SNAPSHOT")
+
+# Navigation states. Every screen returns the state to go to next and
+# run_navigation_loop() dispatches it, so the call stack stays flat.
+MENU = "menu"
+INSTRUCTIONS = "instructions"
+ADD_INCOME = "add_income"
+ADD_EXPENSE = "add_expense"
+VIEW_ALL = "view_all"
+REPORT = "report"
+OVERVIEW = "overview"
+EXIT = "exit"
 
 
 def welcome():
@@ -42,8 +59,80 @@ def welcome():
     """)
 
 
+def save_pending_entries():
+    """Writes the income/expense entries still held in the write buffer."""
+    try:
+        STORAGE.flush()
+    except Exception as error:
+        print(
+            Fore.LIGHTRED_EX +
+            f"Could not store your latest entries yet: {error}" +
+            Style.RESET_ALL)
+
+
+def wait_for_pending_writes():
+    """
+    Waits (at most WRITE_TIMEOUT seconds) until every entry of the
+    session has been stored by the background writer.
+    """
+    try:
+        stored = STORAGE.drain(WRITE_TIMEOUT)
+    except Exception as error:
+        stored = False
+        print(Fore.LIGHTRED_EX + f"{error}" + Style.RESET_ALL)
+    if not stored:
+        print(
+            Fore.LIGHTRED_EX +
+            "Some of your latest entries could not be stored in time." +
+            Style.RESET_ALL)
+
+
+def replay_journal():
+    """
+    Stores the entries that earlier sessions journaled but could not
+    store (e.g. the terminal was closed while they were being saved).
+    """
+    try:
+        replayed = STORAGE.replay()
+    except Exception as error:
+        # The journals are kept, the next session tries again
+        print(
+            Fore.LIGHTRED_EX +
+            f"Could not store the entries of an earlier session: {error}" +
+            Style.RESET_ALL)
+        return
+    if replayed:
+        print(
+            Fore.YELLOW +
+            f"{replayed} entry(ies) of an earlier session stored." +
+            Style.RESET_ALL)
+
+
+def log_api_calls():
+    """
+    Prints the Sheets API calls made in this session, and how often
+    they were throttled or retried, to stderr when the
+    FINANCES_LOG_API_CALLS environment variable is set (for load tests).
+    """
+    if not os.environ.get("FINANCES_LOG_API_CALLS"):
+        return
+    api_calls = STORAGE.api_calls
+    details = ", ".join(
+        f"{call}={count}" for call, count in sorted(api_calls.items()))
+    print(
+        f"Sheets API calls this session: {sum(api_calls.values())} "
+        f"({details})", file=sys.stderr)
+    api_metrics = STORAGE.api_metrics
+    if api_metrics:
+        print("Sheets API quota handling: " + ", ".join(
+            f"{name}={value:g}"
+            for name, value in sorted(api_metrics.items())), file=sys.stderr)
+
+
 def exit_program():
     """Displays a farewell message and terminates the program."""
+    wait_for_pending_writes()
+    log_api_calls()
     exit_message = f"""
     {Fore.GREEN + Style.BRIGHT}
     ✨ Thank you for your contribution! ✨
@@ -55,11 +144,16 @@ def exit_program():
     Stay tuned for updates! 📈🔔
     """
     print(exit_message)
-    exit()
+    # sys.exit (unlike the exit() builtin) leaves stdin open, so a pool
+    # worker can serve its next session on the same terminal
+    sys.exit()
 
 
 def prompt_for_menu_or_exit():
-    """Prompts the user to return to the Menu or to exit the program."""
+    """
+    Prompts the user to return to the Menu or to exit the program.
+    Returns the next navigation state (MENU or EXIT).
+    """
     print("-" * 75)
     print(Fore.BLUE + "\nWhat would you like to do next?" + Style.RESET_ALL)
     while True:
@@ -75,9 +169,9 @@ def prompt_for_menu_or_exit():
             )
             user_input = input(choice_message).strip().upper()
             if user_input == "M":
-                return get_menu_user_choice()
+                return MENU
             elif user_input == "E":
-                exit_program()
+                return EXIT
             else:
                 raise ValueError(
                     Fore.LIGHTRED_EX +
@@ -163,43 +257,51 @@ def show_application_instructions():
          → Net finantial balance (Income - Expenses).
          → A breakdown of expenses by category.
          → The highest expense category.
+         → The median and 90th percentile of the income entries, and
+           of the expense entries of each category.
+
+    {Fore.BLUE} 5. View 2025 OVERVIEW FINANCE REPORTS{Style.RESET_ALL}
+
+       - Year to date: the report of January up to the month you select.
+       - Month range: the report of the months between two you select.
+       - 12-month overview: a table with the income, expenses, balance
+         and highest expense category of every month, and the year total.
 
     {Fore.BLUE} E. Exit Program:{Style.RESET_ALL}
 
        - Close the application. Don't worry; your data remains anonymous ✨.
     """
     print(instructions_part2)
-    prompt_for_menu_or_exit()
+    return prompt_for_menu_or_exit()
 
 
 class FinanceManager:
     """
     Manages financial data for the year 2025 by interacting with a
-    Google Sheet. Provides methods to add income and expense records,
+    storage backend (the Google Sheet or a local SQLite database, see
+    storage.py). Provides methods to add income and expense records,
     retrieves data from the spreadsheet, calculate totals, generate reports,
     and display information to the user. It handles data validation and
     formatting for European currency.
     """
 
-    def __init__(self):
+    def __init__(self, storage=None, report_snapshot_dir=None):
         """
-        Initializes the FinanceManager object
-        and retrieves incomes/expense worksheets.
+        Initializes the FinanceManager object with the storage backend
+        holding the incomes/expenses worksheets (and the columnar
+        snapshot the reports are read from, if any).
         """
-        # Get the income and expenses worksheets
-        self.income_worksheet = SHEET.worksheet("incomes")
-        self.expenses_worksheet = SHEET.worksheet("expenses")
-
-    def _get_worksheet_data(self, worksheet_name):
-        """Gets all data from a specified worksheet"""
-        worksheet_name = SHEET.worksheet(worksheet_name)
-        all_values = worksheet_name.get_all_values()
-        return all_values
+        self.storage = storage if storage is not None else STORAGE
+        self.report_snapshot_dir = (
+            report_snapshot_dir if report_snapshot_dir is not None
+            else REPORT_SNAPSHOT_DIR)
+        # Memory-mapped on the first report
+        self._report_snapshot = None
 
     def _get_next_action_after_data_entry(self):
         """
         Prompts the user for the next action after having added
-        income and /or expenses entries
+        income and /or expenses entries. Returns the next navigation state.
         """
         while True:
             print("-" * 75)
@@ -220,13 +322,13 @@ class FinanceManager:
             )
             user_input = input(choice_message).strip().upper()
             if user_input == "1":
-                return self.add_new_income_to_income_worksheet()
+                return ADD_INCOME
             elif user_input == "2":
-                return self.add_new_expense_to_expense_worksheet()
+                return ADD_EXPENSE
             elif user_input == "M":
-                return get_menu_user_choice()
+                return MENU
             elif user_input == "E":
-                return exit_program()
+                return EXIT
             else:
                 print(
                     Fore.LIGHTRED_EX +
@@ -256,11 +358,13 @@ class FinanceManager:
         month = self.get_and_validate_month_input()
         source = self.get_and_validate_source_input()
         amount = self.get_validated_and_normalized_amount()
-        formatted_amount = self.format_amount_for_display(amount)
 
-        new_income_row = [month, source, formatted_amount]
+        # The amount is stored twice: for display and in integer cents
+        new_income_row = income_row(month, source, amount)
+        # Shown as stored
+        formatted_amount = new_income_row[INCOME_AMOUNT_COLUMN]
 
-        self.income_worksheet.append_row(new_income_row)
+        self.storage.append_row("incomes", new_income_row)
 
         print("\nStoring your income entry ...")
 
@@ -271,15 +375,7 @@ class FinanceManager:
         {Style.RESET_ALL}
         """)
         # Prompt the user to choose what to do next
-        next_action = self._get_next_action_after_data_entry()
-        if next_action == "1":
-            return self.add_new_income_to_income_worksheet()
-        elif next_action == "2":
-            return self.add_new_expense_to_expense_worksheet()
-        elif next_action == "M":
-            return get_menu_user_choice()
-        elif next_action == "E":
-            return exit_program()
+        return self._get_next_action_after_data_entry()
 
     def add_new_expense_to_expense_worksheet(self):
         """Adds a new expense record to the "expense" worksheet."""
@@ -324,10 +420,10 @@ class FinanceManager:
 
         description = self.get_and_validate_description_input()
         amount = self.get_validated_and_normalized_amount()
-        formatted_amount = self.format_amount_for_display(amount)
 
-        new_expense_row = [month, category, description, formatted_amount]
-        self.expenses_worksheet.append_row(new_expense_row)
+        new_expense_row = expense_row(month, category, description, amount)
+        formatted_amount = new_expense_row[EXPENSE_AMOUNT_COLUMN]
+        self.storage.append_row("expenses", new_expense_row)
 
         print("\nStoring your expense entry ...")
 
@@ -338,15 +434,7 @@ class FinanceManager:
         {Style.RESET_ALL}
         """)
         # Prompt the user to choose what to do next
-        next_action = self._get_next_action_after_data_entry()
-        if next_action == "1":
-            return self.add_new_income_to_income_worksheet()
-        elif next_action == "2":
-            return self.add_new_expense_to_expense_worksheet()
-        elif next_action == "M":
-            return get_menu_user_choice()
-        elif next_action == "E":
-            return exit_program()
+        return self._get_next_action_after_data_entry()
 
     def get_and_validate_month_input(self):
         """Prompts the user to enter a month name and validates the input."""
@@ -355,19 +443,11 @@ class FinanceManager:
                 Fore.BLUE + "Enter the month name (e.g., january):\n" +
                 Style.RESET_ALL)
 
-            user_month = input(prompt_month).strip().lower()
-
             try:
-                # Interpret the month input as a full month name
-                datetime.strptime(user_month, "%B")
-                month = user_month.title()
-                return month
-
-            except ValueError:
-                print(
-                    Fore.LIGHTRED_EX +
-                    "Invalid input: Enter a month name." +
-                    Style.RESET_ALL)
+                # A full month name, see validators.py
+                return validate_month(input(prompt_month))
+            except ValueError as error:
+                print(Fore.LIGHTRED_EX + str(error) + Style.RESET_ALL)
 
     def get_and_validate_input(self, prompt, min_length=4, require_alpha=True):
         """
@@ -375,35 +455,11 @@ class FinanceManager:
         Used for the source and the description inputs.
         """
         while True:
-            user_input = input(Fore.BLUE + prompt + Style.RESET_ALL).strip()
-            # Checks if input length is valid
-            if len(user_input) < min_length:
-                print(f"""
-                    {Fore.LIGHTRED_EX}
-                    Invalid input: Must be at least {min_length} characters,
-                    contain letters, and not be all numbers.
-                    {Style.RESET_ALL}
-                """)
-                continue
-            # Check if input does not have letters
-            if require_alpha and not re.search('[a-zA-Z]', user_input):
-                print(f"""
-                    {Fore.LIGHTRED_EX}
-                    Invalid input: Must be at least {min_length} characters,
-                    contain letters, and not be all numbers.
-                    {Style.RESET_ALL}
-                """)
-                continue
-
-            if user_input.isdigit():
-                print(
-                    Fore.LIGHTRED_EX +
-                    "Invalid input: Cannot be entirely numeric." +
-                    Style.RESET_ALL
-                )
-                continue
-
-            return user_input
+            user_input = input(Fore.BLUE + prompt + Style.RESET_ALL)
+            try:
+                return validate_text(user_input, min_length, require_alpha)
+            except ValueError as error:
+                print(Fore.LIGHTRED_EX + str(error) + Style.RESET_ALL)
 
     def get_and_validate_source_input(self):
         """
@@ -435,23 +491,11 @@ class FinanceManager:
                 print(f"- {cat}")
             prompt_category = (
                 Fore.BLUE + "\nEnter the category:\n" + Style.RESET_ALL)
-            category_input = input(prompt_category).strip().lower()
-
-            # Check for empty input
-            if not category_input:
-                print(
-                    Fore.LIGHTRED_EX +
-                    "Empty input: Please choose a category from the list.\n" +
-                    Style.RESET_ALL)
-                continue
-            # Return the category in title case
-            if category_input.title() in CATEGORIES:
-                return category_input.title()
-            else:
-                print(
-                    Fore.LIGHTRED_EX +
-                    "\nInvalid category. Please choose from the following:\n" +
-                    Style.RESET_ALL)
+            try:
+                # Returned in title case
+                return validate_category(input(prompt_category))
+            except ValueError as error:
+                print(Fore.LIGHTRED_EX + str(error) + Style.RESET_ALL)
 
     def get_validated_and_normalized_amount(self):
         """
@@ -469,94 +513,28 @@ class FinanceManager:
                 Fore.BLUE + "Enter an amount (EUR):\n" +
                 Style.RESET_ALL
             )
-            amount_input = input(prompt_amount).strip()
-
-            # Do not allow an empty input
-            if not amount_input:
-                print(
-                    Fore.LIGHTRED_EX +
-                    "Empty amount: Please enter a positive amount." +
-                    Style.RESET_ALL
-                )
-                continue
-
-            # Reject negative amounts
-            if amount_input.startswith("-"):
-                print(
-                    Fore.LIGHTRED_EX +
-                    "Invalid amount: Amount must be positive." +
-                    Style.RESET_ALL)
-                continue
-
-            # Remove all non-digit characters (but keep . and , and spaces)
-            amount_input = re.sub(r"[^\d., ]", "", amount_input)
-
-            # Remove spaces as potential thousands separators
-            amount_input = amount_input.replace(" ", "")
-
-            # Check if there is any comma and no dot
-            # If yes, replace the comma with dot
-            if "," in amount_input and "." not in amount_input:
-                amount_input = amount_input.replace(",", ".")
-
-            # Check if there is any dot and no comma. If yes, nothing happens
-            elif "." in amount_input and "," not in amount_input:
-                pass
-
-            # Check if there are both comma and dot. If yes, then:
-            # Case a) 12,345.67 (US format)
-            # Case b) 12.345,67 (EU format)
-
-            elif "." in amount_input and "," in amount_input:
-
-                # Find the rightmost occurrence INDEX of either a "." or a ","
-                last_dot = amount_input.rfind(".")
-                last_comma = amount_input.rfind(",")
-                last_separator = max(last_dot, last_comma)
-
-                # Case a) 12,345.67 (US format)
-                if amount_input[last_separator] == ".":
-                    amount_input = amount_input.replace(",", "")
-                    # Replace only the first found dot
-                    amount_input = amount_input.replace(".", ",", 1)
-                else:
-                    amount_input = amount_input.replace(".", "")
-
-            # Ensure amount_input can be used with float()
-            amount_input = amount_input.replace(",", ".")
-
+            # European (1.234,56) or US (1,234.56) format
             try:
-                amount = float(amount_input)
-                return amount
-            except ValueError:
-                print(
-                    Fore.LIGHTRED_EX +
-                    "Invalid amount format. Use this format (e.g) 1.234,56" +
-                    Style.RESET_ALL)
+                return validate_amount(input(prompt_amount))
+            except ValueError as error:
+                print(Fore.LIGHTRED_EX + str(error) + Style.RESET_ALL)
 
     def format_amount_for_display(self, amount):
-        """Formats the amount for display (European format)."""
-        fmt = "{:,.2f}".format(amount)
-        fmt_amount = fmt.replace(",", "X").replace(".", ",").replace("X", ".")
-
-        # Formated to standard European style (e.g., 1.234,56)
-        return fmt_amount
+        """Formats the amount for display (European format, 1.234,56)."""
+        return format_amount_for_display(amount)
 
     def display_worksheet(self, worksheet):
-        """Gets data from a given worksheet."""
-        all_worksheet_values = self._get_worksheet_data(worksheet)
-
-        # Check if the worksheet is completely empty
-        if not all_worksheet_values:
-            print(
-                Fore.LIGHTRED_EX +
-                f"No data available in this {worksheet.capitalize()}." +
-                Style.RESET_ALL)
-            return
+        """
+        Displays the data of a given worksheet one page at a time. Only
+        the rows of the page shown are downloaded.
+        """
+        pages = WorksheetPages(self.storage, worksheet, PAGE_ROWS)
+        print(f"\nGetting {worksheet.capitalize()} data...")
+        page_number = 0
+        data_rows, has_next_page = pages.page(page_number)
 
-        # Check if only the header row exists (no actual data)
-        if len(all_worksheet_values) <= 1:
-            print(f"\nGetting {worksheet.capitalize()} data...")
+        # Check if no data rows exist (at most the header row)
+        if not data_rows:
             print(
                 Fore.YELLOW +
                 f"\nNo {worksheet.capitalize()} data has been entered yet!\n" +
@@ -564,87 +542,145 @@ class FinanceManager:
             )
             return
 
-        # Get header row
-        header_row = all_worksheet_values[0]
-
-        # Get data rows
-        data_rows = all_worksheet_values[1:]
+        # Only the display columns are shown (not amount_cents)
+        header_row = DISPLAY_COLUMNS[worksheet]
+        column_count = len(header_row)
 
         print(f"""
         {Fore.GREEN + Style.BRIGHT}
         ==== {worksheet.upper()} DATA IN 2025 ====
         {Style.RESET_ALL}""")
 
-        # Use tabulate to display data in tabular form
-        print(f"Getting {worksheet.capitalize()} data...\n")
-        print(tabulate(data_rows, headers=header_row, tablefmt="pretty"))
-
-    def _month_has_data(self, worksheet_data, month):
-        """Checks if month data exists in a worksheet."""
-        for row in worksheet_data:
-            if row[0].lower() == month.lower():
-                return True
-        return False
-
-    def _calculate_total_amount(self, worksheet_data, month, amount_col_index):
-        """Calculates the total amount for the given month and worksheet."""
-        total_amount = 0
-        for row in worksheet_data:
-            if row[0].lower() == month.lower():
-                try:
-                    # Get the amount from the worksheet as a string
-                    amount = row[amount_col_index]
-                    # Normalize the string (handle European format)
-                    amount_norm = amount.replace(".", "").replace(",", ".")
-                    # Convert string float after normalization
-                    total_amount += float(amount_norm)
-                except ValueError:
+        # Use tabulate to display data in tabular form (imported here,
+        # since only the table screens need it)
+        from tabulate import tabulate
+        while True:
+            print(tabulate(
+                [row[:column_count] for row in data_rows],
+                headers=header_row, tablefmt="pretty"))
+            if page_number == 0 and not has_next_page:
+                # Everything fits in one page
+                return
+            first_row = page_number * pages.page_rows + 1
+            print(
+                f"Page {page_number + 1}: rows {first_row} to "
+                f"{first_row + len(data_rows) - 1}")
+
+            action = self._get_page_action(page_number > 0, has_next_page)
+            if action == "D":
+                return
+            if action == "N":
+                page_number += 1
+            elif action == "P":
+                page_number -= 1
+            else:
+                month = self.get_and_validate_month_input()
+                month_page = pages.page_of_month(month)
+                if month_page is None:
                     print(
-                        f"Could not convert amount in {row} to a number."
-                    )
-        return total_amount
-
-    def _calc_expenses_by_category(self, expenses_data, month):
-        """Calculate expenses per category in a given month."""
-        expenses_by_category = {}
-
-        for row in expenses_data:
-            if row[0].lower() == month.lower():
-                # Normalize category input to title
-                category = row[1].title()
-                try:
-                    # Get the amount from the worksheet as a string
-                    amount = row[3]
-                    # Normalize the string (handle European format)
-                    amount_norm = amount.replace(".", "").replace(",", ".")
-                    # Convert string float after normalization
-                    amount = float(amount_norm)
-                except ValueError:
-                    print(f"""
-                    {Fore.LIGHTRED_EX}Could not convert amount in {row}
-                    to a number."
-                    {Style.RESET_ALL}
-                    """)
-                    continue
-                if category in expenses_by_category:
-                    expenses_by_category[category] += amount
+                        Fore.YELLOW +
+                        f"\nNo {worksheet.capitalize()} data for {month}.\n" +
+                        Style.RESET_ALL)
                 else:
-                    expenses_by_category[category] = amount
-        return expenses_by_category
+                    page_number = month_page
+            data_rows, has_next_page = pages.page(page_number)
 
-    def _max_expense_by_category(self, expenses_by_category):
+    def _get_page_action(self, has_previous_page, has_next_page):
         """
-        Finds the category with the maximum expense, or None if no expenses.
-        Handles the case where expenses_by_category is empty.
+        Prompts the user for the next action while paging a worksheet.
+        Returns N (next page), P (previous page), J (jump to a month) or
+        D (done).
         """
-        if not expenses_by_category:
-            return None, None
-        max_category = max(expenses_by_category, key=expenses_by_category.get)
-        max_amount = expenses_by_category[max_category]
+        options = []
+        if has_next_page:
+            options.append(("N", "Press N to see the NEXT page."))
+        if has_previous_page:
+            options.append(("P", "Press P to see the PREVIOUS page."))
+        options.append(("J", "Press J to JUMP to the first page of a month."))
+        options.append(("D", "Press D when you are DONE with this data."))
+        keys = [key for key, _ in options]
+        while True:
+            print("\n".join(" " * 18 + text for _, text in options))
+            choice_message = (
+                Fore.BLUE + Style.BRIGHT +
+                f"Enter your choice ({', '.join(keys)}) and press enter:\n" +
+                Style.RESET_ALL
+            )
+            user_input = input(choice_message).strip().upper()
+            if user_input in keys:
+                return user_input
+            print(
+                Fore.LIGHTRED_EX +
+                f"Invalid input. Please enter {', '.join(keys)}." +
+                Style.RESET_ALL)
 
-        return max_category, max_amount
+    def _get_report_snapshot(self):
+        """
+        Returns the memory-mapped columnar snapshot of the reports, or
+        None if there is none (or it cannot be opened).
+        """
+        if self._report_snapshot is None and self.report_snapshot_dir:
+            try:
+                # pyarrow is only imported when a snapshot is used
+                from arrow_snapshot import ArrowSnapshot
+                self._report_snapshot = ArrowSnapshot(
+                    self.report_snapshot_dir)
+            except (ImportError, OSError) as error:
+                print(
+                    Fore.YELLOW +
+                    f"Report snapshot not used ({error}), "
+                    "reading the worksheets instead." +
+                    Style.RESET_ALL)
+                self.report_snapshot_dir = None
+        return self._report_snapshot
 
-    def show_monthly_expenses_details(self, month):
+    def _get_month_summary(self, month):
+        """
+        Returns the MonthSummary of a month: from the columnar report
+        snapshot if one is configured, else its materialized report
+        when there is one. Otherwise the storage summarizes the month
+        (from its own rows when it can read a single month, else from
+        the incrementally updated aggregates of the whole worksheets).
+        """
+        report_snapshot = self._get_report_snapshot()
+        if report_snapshot is not None:
+            return report_snapshot.month_summary(month)
+        month_summary = self.storage.get_report(month)
+        if month_summary is not None:
+            return month_summary
+        return self.storage.get_month_summaries(
+            [month.lower()])[month.lower()]
+
+    def _get_year_summaries(self):
+        """
+        Returns {lowercase month: MonthSummary} of all 12 months at once:
+        from the columnar report snapshot if one is configured, else
+        from the materialized reports (one read) when every month has
+        one, else from the aggregates of the whole worksheets kept by
+        the storage (one pass over each, or none when up to date).
+        """
+        report_snapshot = self._get_report_snapshot()
+        if report_snapshot is not None:
+            return {
+                month: report_snapshot.month_summary(month)
+                for month in MONTH_NAMES}
+        reports = self.storage.get_reports()
+        if len(reports) == len(MONTH_NAMES):
+            return reports
+        return self.storage.get_month_summaries(MONTH_NAMES)
+
+    def _format_distribution(self, sketch):
+        """
+        Returns the median and the 90th percentile of the amounts of a
+        QuantileSketch, for display.
+        """
+        median = format_cents_for_display(sketch.quantile(0.5))
+        p90 = format_cents_for_display(sketch.quantile(0.9))
+        return (
+            f"per entry: median {median} EUR, "
+            f"90th percentile {p90} EUR ({sketch.count} in all)")
+
+    def show_monthly_expenses_details(self, month, month_summary):
         """Displays detailed expense information for a given month."""
         print(
             Fore.GREEN + Style.BRIGHT +
@@ -652,8 +688,7 @@ class FinanceManager:
             Style.RESET_ALL)
 
         # Show expenses per category
-        exp_data = self._get_worksheet_data("expenses")
-        expenses_by_category = self._calc_expenses_by_category(exp_data, month)
+        expenses_by_category = month_summary.expenses_by_category
 
         if not expenses_by_category:
             print(
@@ -664,15 +699,18 @@ class FinanceManager:
 
         for category, amount in expenses_by_category.items():
             # Format max_amount for display in European format
-            formatted_amount = self.format_amount_for_display(amount)
-            print(f"→ {category.upper()}: {formatted_amount} EUR \n")
+            formatted_amount = format_cents_for_display(amount)
+            print(f"→ {category.upper()}: {formatted_amount} EUR")
+            sketch = month_summary.expense_sketches.get(category)
+            if sketch is not None and sketch.count:
+                print(f"  {self._format_distribution(sketch)}")
+            print()
 
         # Show max expense by category
-        max_category, max_amount = self._max_expense_by_category(
-            expenses_by_category)
+        max_category, max_amount = month_summary.max_expense_category()
         # Format max_amount for display in European format
         if max_amount is not None:
-            formatted_max_amount = self.format_amount_for_display(max_amount)
+            formatted_max_amount = format_cents_for_display(max_amount)
         # Handle None case
         else:
             formatted_max_amount = "0.00"
@@ -683,7 +721,78 @@ class FinanceManager:
         {highest} {max_category.upper()} ({formatted_max_amount} EUR)
         """)
 
-    def _get_next_action_after_report(self):
+    def _show_period_report(self, period, summary):
+        """
+        Displays the report of a MonthSummary: of one month, or of
+        several months combined (period names them).
+        """
+        # Check if the period exists within the data
+        has_income = summary.has_income
+        has_expenses = summary.has_expenses
+
+        if has_income or has_expenses:
+            print(
+                Fore.GREEN + Style.BRIGHT +
+                f"\nCalculating {period} income and expenses...\n" +
+                Style.RESET_ALL)
+            for row in summary.invalid_rows:
+                print(f"Could not convert amount in {row} to a number.")
+            if not has_income:
+                print(
+                    Fore.YELLOW +
+                    f"Warning: NO INCOME data found for {period}!\n" +
+                    Style.RESET_ALL)
+                total_income = 0
+                formatted_income = format_cents_for_display(
+                    total_income)
+            else:
+                total_income = summary.total_income_cents
+                # Show the income in European currency format
+                formatted_income = format_cents_for_display(
+                    total_income)
+            if not has_expenses:
+                print(
+                    Fore.YELLOW +
+                    f"Warning: NO EXPENSES data found for {period}!\n" +
+                    Style.RESET_ALL)
+                total_expenses = 0
+                formatted_expense = format_cents_for_display(
+                    total_expenses)
+            else:
+                total_expenses = summary.total_expenses_cents
+                # Show the expenses in European currency format
+                formatted_expense = format_cents_for_display(
+                    total_expenses)
+
+            print(f"✅ AGGREGATE TOTAL INCOME: {formatted_income} EUR")
+            if summary.income_sketch.count:
+                print(
+                    "   Income " +
+                    self._format_distribution(summary.income_sketch))
+            print(f"✅ AGGREGATE TOTAL EXPENSES: {formatted_expense} EUR\n")
+
+            # Calculate net financial balance
+            print(
+                Fore.GREEN + Style.BRIGHT +
+                f"\nCalculating net financial balance for {period}\n" +
+                Style.RESET_ALL
+                )
+            balance = total_income - total_expenses
+            formatted_balance = format_cents_for_display(balance)
+
+            if balance >= 0:
+                print(f"🎉🎉 Positive Balance!: {formatted_balance} EUR\n")
+            else:
+                print(f"🚨🚨 Negative Balance!: {formatted_balance} EUR\n")
+
+            self.show_monthly_expenses_details(period, summary)
+        else:
+            print(f"""
+            {Fore.LIGHTRED_EX}\nThere is no data for {period} yet...
+            {Style.RESET_ALL}
+            """)
+
+    def _get_next_action_after_report(self, another="ANOTHER MONTH"):
         """Prompts the user for the next action after report generation."""
         while True:
             print("-" * 75)
@@ -691,8 +800,8 @@ class FinanceManager:
                 Fore.BLUE +
                 "\nWhat would you like to do next?" +
                 Style.RESET_ALL)
-            print("""
-                  Press R to generate a report for ANOTHER MONTH.
+            print(f"""
+                  Press R to generate a report for {another}.
                   Press M to go back to the MENU.
                   Press E to EXIT the program.
             """)
@@ -711,7 +820,10 @@ class FinanceManager:
                     Style.RESET_ALL)
 
     def generate_monthly_finance_report(self):
-        """Generates and displays the monthly finance report."""
+        """
+        Generates and displays the monthly finance report.
+        Returns the next navigation state.
+        """
         report_message = f"""
         {Fore.GREEN + Style.BRIGHT}
         ✨✨  AGGREGATED 2025 MONTHLY FINANCE REPORT  ✨✨
@@ -725,6 +837,8 @@ class FinanceManager:
           Aggregate Total Income - Aggregate Total Expenses
         → A Breakdown of Expenses by Category
         → The Highest Expense Category
+        → The Median and 90th Percentile of the Income and of the
+          Expenses of each Category, per entry
 
         Please enter the month you'd like to review:
         """
@@ -733,91 +847,152 @@ class FinanceManager:
         while True:
             # User inputs the month
             month = self.get_and_validate_month_input()
+            self._show_period_report(month, self._get_month_summary(month))
 
-            # Get all data of a worksheet
-            income_data = self._get_worksheet_data("incomes")
-            expenses_data = self._get_worksheet_data("expenses")
+            # Get user's next action
+            next_action = self._get_next_action_after_report()
 
-            # Check if the month exists within the data
-            income_month_data_exists = self._month_has_data(income_data, month)
-            exp_month_data_exists = self._month_has_data(expenses_data, month)
+            # Generate another report
+            if next_action == "R":
+                continue
+            elif next_action == "M":
+                return MENU
+            elif next_action == "E":
+                return EXIT
 
-            if income_month_data_exists or exp_month_data_exists:
-                print(
-                    Fore.GREEN + Style.BRIGHT +
-                    f"\nCalculating {month} income and expenses...\n" +
-                    Style.RESET_ALL)
-                if not income_month_data_exists:
-                    print(
-                        Fore.YELLOW +
-                        f"Warning: NO INCOME data found for {month}!\n" +
-                        Style.RESET_ALL)
-                    total_month_income = 0
-                    formatted_income = self.format_amount_for_display(
-                        total_month_income)
-                else:
-                    total_month_income = self._calculate_total_amount(
-                        income_data, month, 2)
-                    # Show the income in European currency format
-                    formatted_income = self.format_amount_for_display(
-                        total_month_income)
-                if not exp_month_data_exists:
-                    print(
-                        Fore.YELLOW +
-                        f"Warning: NO EXPENSES data found for {month}!\n" +
-                        Style.RESET_ALL)
-                    total_month_expenses = 0
-                    formatted_expense = self.format_amount_for_display(
-                        total_month_expenses)
-                else:
-                    total_month_expenses = self._calculate_total_amount(
-                        expenses_data, month, 3)
-                    # Show the expenses in European currency format
-                    formatted_expense = self.format_amount_for_display(
-                        total_month_expenses)
+    def _get_overview_mode(self):
+        """
+        Prompts the user for the kind of overview report. Returns Y
+        (year to date), R (month range) or O (12-month overview table).
+        """
+        while True:
+            print("""
+                  Press Y for the YEAR TO DATE totals up to a month.
+                  Press R for the totals of a RANGE of months.
+                  Press O for the 12-MONTH OVERVIEW table.
+            """)
+            choice_message = (
+                Fore.BLUE + Style.BRIGHT +
+                "Enter your choice (Y, R or O) and press enter:\n" +
+                Style.RESET_ALL
+            )
+            user_input = input(choice_message).strip().upper()
+            if user_input in ("Y", "R", "O"):
+                return user_input
+            print(
+                Fore.LIGHTRED_EX +
+                "Invalid input. Please enter Y, R, or O." +
+                Style.RESET_ALL)
 
-                print(f"✅ AGGREGATE TOTAL INCOME: {formatted_income} EUR")
-                print(f"✅ AGGREGATE TOTAL EXPENSES: {formatted_expense} EUR\n")
+    def _get_month_range_input(self):
+        """
+        Prompts the user for the first and the last month of a range.
+        Returns their names, the last one not before the first one.
+        """
+        while True:
+            print(Fore.BLUE + "First month of the range:" + Style.RESET_ALL)
+            first_month = self.get_and_validate_month_input()
+            print(Fore.BLUE + "Last month of the range:" + Style.RESET_ALL)
+            last_month = self.get_and_validate_month_input()
+            if months_between(first_month, last_month):
+                return first_month, last_month
+            print(
+                Fore.LIGHTRED_EX +
+                f"Invalid range: {last_month} comes before {first_month}." +
+                Style.RESET_ALL)
 
-                # Calculate net financial balance
-                print(
-                    Fore.GREEN + Style.BRIGHT +
-                    f"\nCalculating net financial balance for {month}\n" +
-                    Style.RESET_ALL
-                    )
-                balance = total_month_income - total_month_expenses
-                formatted_balance = self.format_amount_for_display(balance)
+    def show_year_overview(self, summaries):
+        """
+        Displays a table of the income, expenses, balance and highest
+        expense category of every month, and of the whole year.
+        """
+        from tabulate import tabulate
+        table = []
+        for month in MONTH_NAMES:
+            summary = summaries[month]
+            top_category, _ = summary.max_expense_category()
+            table.append([
+                month.title(),
+                format_cents_for_display(summary.total_income_cents),
+                format_cents_for_display(summary.total_expenses_cents),
+                format_cents_for_display(summary.balance_cents),
+                top_category or "-"])
+        year = MonthSummary.combined(summaries.values())
+        top_category, _ = year.max_expense_category()
+        table.append([
+            "TOTAL",
+            format_cents_for_display(year.total_income_cents),
+            format_cents_for_display(year.total_expenses_cents),
+            format_cents_for_display(year.balance_cents),
+            top_category or "-"])
+        for row in year.invalid_rows:
+            print(f"Could not convert amount in {row} to a number.")
+        print(tabulate(
+            table, tablefmt="pretty",
+            headers=["Month", "Income (EUR)", "Expenses (EUR)",
+                     "Balance (EUR)", "Top category"]))
+
+    def generate_overview_report(self):
+        """
+        Generates and displays the reports of several months: the year
+        to date, a range of months or the 12-month overview. All of them
+        come from the summaries of the whole year, read at once.
+        Returns the next navigation state.
+        """
+        report_message = f"""
+        {Fore.GREEN + Style.BRIGHT}
+        ✨✨  2025 OVERVIEW FINANCE REPORTS  ✨✨
+        {Style.RESET_ALL}
 
-                if balance >= 0:
-                    print(f"🎉🎉 Positive Balance!: {formatted_balance} EUR\n")
-                else:
-                    print(f"🚨🚨 Negative Balance!: {formatted_balance} EUR\n")
+        These reports show you several months together:
 
-                self.show_monthly_expenses_details(month)
-            else:
-                print(f"""
-                {Fore.LIGHTRED_EX}\nThere is no data for {month} yet...
-                {Style.RESET_ALL}
-                """)
+        → Year to date: the totals from January to the month you select
+        → Month range: the totals of the months between two you select
+        → 12-month overview: Income, Expenses, Balance and the Highest
+          Expense Category of every month, side by side
+        """
+        print(report_message)
 
-                # Get user's next action
-            next_action = self._get_next_action_after_report()
+        while True:
+            mode = self._get_overview_mode()
+            if mode == "Y":
+                last_month = self.get_and_validate_month_input()
+                months = months_between("january", last_month)
+                period = f"January to {last_month}"
+            elif mode == "R":
+                first_month, last_month = self._get_month_range_input()
+                months = months_between(first_month, last_month)
+                period = f"{first_month} to {last_month}"
+
+            summaries = self._get_year_summaries()
+            if mode == "O":
+                self.show_year_overview(summaries)
+            else:
+                self._show_period_report(
+                    period, MonthSummary.combined(
+                        summaries[month] for month in months))
 
-            # Generate another report
+            next_action = self._get_next_action_after_report(
+                "ANOTHER PERIOD")
             if next_action == "R":
                 continue
             elif next_action == "M":
-                return get_menu_user_choice()
+                return MENU
             elif next_action == "E":
-                exit_program()
+                return EXIT
+
+
+# One manager (and so one set of worksheet handles and one snapshot
+# cache) for the whole session, whatever the menu navigation
+FINANCE_MANAGER = FinanceManager()
 
 
 def validate_user_numbers_choice(user_input):
     """Validates the user's choice."""
-    if not 0 <= user_input <= 4:
+    if not 0 <= user_input <= 5:
         raise ValueError(
             Fore.LIGHTRED_EX +
-            "Invalid input: Please enter a number (0-4) or E.\n" +
+            "Invalid input: Please enter a number (0-5) or E.\n" +
             Style.RESET_ALL)
 
 
@@ -829,29 +1004,32 @@ def is_valid_number(input_value):
 
 
 def handle_user_option(option):
-    """Handles user option."""
-    finance_manager = FinanceManager()
-
-    if option == 0:
-        show_application_instructions()
-
-    elif option == 1:
-        finance_manager.add_new_income_to_income_worksheet()
-
-    elif option == 2:
-        finance_manager.add_new_expense_to_expense_worksheet()
+    """Returns the navigation state that handles a menu option."""
+    option_states = {
+        0: INSTRUCTIONS,
+        1: ADD_INCOME,
+        2: ADD_EXPENSE,
+        3: VIEW_ALL,
+        4: REPORT,
+        5: OVERVIEW,
+    }
+    return option_states[option]
 
-    elif option == 3:
-        finance_manager.display_worksheet("incomes")
-        finance_manager.display_worksheet("expenses")
-        prompt_for_menu_or_exit()
 
-    elif option == 4:
-        return finance_manager.generate_monthly_finance_report()
+def view_all_incomes_and_expenses():
+    """Displays both worksheets. Returns the next navigation state."""
+    FINANCE_MANAGER.display_worksheet("incomes")
+    FINANCE_MANAGER.display_worksheet("expenses")
+    return prompt_for_menu_or_exit()
 
 
 def get_menu_user_choice():
-    """Gets the user's choice from the menu options."""
+    """
+    Gets the user's choice from the menu options.
+    Returns the navigation state of the chosen option.
+    """
+    # Store the entries buffered so far whenever the user is back here
+    save_pending_entries()
     while True:
         print(f"""
     {Fore.GREEN + Style.BRIGHT}==== MENU OPTIONS ===={Style.RESET_ALL}
@@ -861,32 +1039,33 @@ def get_menu_user_choice():
     Press 2 to add a new expense entry (Month, Category, Description, Amount).
     Press 3 to view all incomes and expenses.
     Press 4 to view AGGREGATED 2025 MONTHLY FINANCE REPORT.
+    Press 5 to view 2025 YEAR TO DATE, MONTH RANGE or 12-MONTH OVERVIEW.
     Press E to exit the program.
         """)
 
         try:
             choice_message = (
                 Fore.BLUE + Style.BRIGHT +
-                "\nEnter your choice (0-4 or E) and press enter:\n" +
+                "\nEnter your choice (0-5 or E) and press enter:\n" +
                 Style.RESET_ALL
             )
             user_input = input(choice_message).strip().upper()
 
             if user_input == "E":
-                return exit_program()
+                return EXIT
 
             # Check for empty input
             if not user_input:
                 raise ValueError(
                     Fore.LIGHTRED_EX +
-                    "Empty input: Please enter a number (0-4) or E.\n" +
+                    "Empty input: Please enter a number (0-5) or E.\n" +
                     Style.RESET_ALL
                 )
             # Check if input looks like a number
             if not is_valid_number(user_input):
                 raise ValueError(
                     Fore.LIGHTRED_EX +
-                    "Invalid input: Please enter a number (0-4) or E.\n" +
+                    "Invalid input: Please enter a number (0-5) or E.\n" +
                     Style.RESET_ALL
                 )
             # Convert user input to integer
@@ -899,13 +1078,35 @@ def get_menu_user_choice():
             print(error)
 
 
+def run_navigation_loop(state=MENU):
+    """
+    Runs the screen of the current state until the user exits. Screens
+    return the next state instead of calling each other, so the session
+    uses the same stack depth after one entry or after thousands.
+    """
+    screens = {
+        MENU: get_menu_user_choice,
+        INSTRUCTIONS: show_application_instructions,
+        ADD_INCOME: FINANCE_MANAGER.add_new_income_to_income_worksheet,
+        ADD_EXPENSE: FINANCE_MANAGER.add_new_expense_to_expense_worksheet,
+        VIEW_ALL: view_all_incomes_and_expenses,
+        REPORT: FINANCE_MANAGER.generate_monthly_finance_report,
+        OVERVIEW: FINANCE_MANAGER.generate_overview_report,
+    }
+    while state != EXIT:
+        state = screens[state]()
+    exit_program()
+
+
 def main():
     """
     Initializes the application, displays the welcome message,
     and starts the main menu loop.
     """
     welcome()
-    get_menu_user_choice()
+    replay_journal()
+    run_navigation_loop()
 
 
-main()
+if __name__ == "__main__":
+    main()
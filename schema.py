@@ -0,0 +1,45 @@
+"""
+Layout of the CommunityFinances App worksheets: their columns and the
+values the month and category columns can hold.
+"""
+import calendar
+
+
+# List of valid expense categories
+CATEGORIES = [
+    "Housing", "Transportation", "Food", "Personal Care", "Healthcare",
+    "Entertainment", "Shopping", "Education", "Travel", "Gifts", "Other"
+]
+
+# Lowercase month names, as entered through get_and_validate_month_input
+MONTH_NAMES = [name.lower() for name in calendar.month_name[1:]]
+
+# Columns shown to the user, in column order
+DISPLAY_COLUMNS = {
+    "incomes": ["month", "source", "amount"],
+    "expenses": ["month", "category", "description", "amount"],
+}
+
+# The amount in integer cents, next to the EU-formatted display amount.
+# Rows stored before this column existed are filled in by
+# "python3 migrate.py backfill-cents".
+AMOUNT_CENTS_COLUMN = "amount_cents"
+
+# Idempotency key of a row, from the write-ahead journal (journal.py).
+# Empty for rows stored before it existed.
+ENTRY_ID_COLUMN = "entry_id"
+
+# Header row of each worksheet, in column order
+WORKSHEET_HEADERS = {
+    name: columns + [AMOUNT_CENTS_COLUMN, ENTRY_ID_COLUMN]
+    for name, columns in DISPLAY_COLUMNS.items()
+}
+
+# Materialized monthly reports (see reports.py): one row per month, in
+# month order, below the header row
+REPORTS_WORKSHEET = "reports"
+REPORT_HEADER = [
+    "month", "has_income", "has_expenses", "total_income_cents",
+    "total_expenses_cents", "expenses_by_category", "invalid_rows",
+    "updated_at", "amount_sketches",
+]
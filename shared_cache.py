@@ -0,0 +1,176 @@
+"""
+Snapshot cache shared by all the app processes of a host.
+
+Every terminal session runs its own Python process, so with a cache per
+process 50 sessions mean 50 downloads of the same worksheets. A
+SharedSnapshotCache keeps the snapshots in files instead (in
+FINANCES_SHARED_CACHE_DIR), with a revision number per worksheet:
+
+    <worksheet>.snapshot   the rows and the revision they belong to
+    <worksheet>.revision   the current revision and when the rows were
+                           downloaded (a few bytes, read on every get)
+
+A process only loads the snapshot file again when the revision changed.
+Refreshes and writes take an exclusive lock on <worksheet>.lock, so one
+process downloads a worksheet per TTL window while the others wait for
+its snapshot, and a process that stores rows adds them to the shared
+snapshot and bumps the revision, so every session sees them.
+
+The snapshots are loaded with marshal, so the directory must be this
+user's own and closed to everyone else (it is created as such).
+"""
+from contextlib import contextmanager
+import marshal
+import os
+import stat
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows: create_storage() keeps a cache per process
+    fcntl = None
+
+from cache import DEFAULT_TTL_SECONDS
+from rowstore import CompactRows
+
+
+def make_private_directory(directory):
+    """
+    Creates a directory only this user can use, or checks that an
+    existing one is this user's own (closing it to the others if need
+    be). Raises PermissionError if it belongs to someone else.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    # lstat: a symbolic link planted in its place is refused too
+    status = os.lstat(directory)
+    if not stat.S_ISDIR(status.st_mode) or status.st_uid != os.getuid():
+        raise PermissionError(
+            f"The cache folder {directory} is not this user's own.")
+    if stat.S_IMODE(status.st_mode) & 0o077:
+        os.chmod(directory, 0o700)
+
+
+class SharedSnapshotCache:
+    """Same interface as SnapshotCache, backed by files in a directory."""
+
+    def __init__(self, directory, ttl=DEFAULT_TTL_SECONDS, clock=time.time):
+        self.directory = directory
+        self.ttl = ttl
+        # Wall-clock time, as it is compared across processes
+        self.clock = clock
+        make_private_directory(directory)
+        # worksheet name -> (revision, rows) loaded by this process
+        self._loaded = {}
+        # worksheet name -> [lock file, times locked by this process]
+        self._locks = {}
+
+    def _path(self, worksheet_name, suffix):
+        """Returns the path of one of the files of a worksheet."""
+        return os.path.join(self.directory, f"{worksheet_name}.{suffix}")
+
+    @contextmanager
+    def refreshing(self, worksheet_name):
+        """
+        Holds the exclusive lock of a worksheet (re-entrant within this
+        process): other processes wait to refresh or write it.
+        """
+        lock = self._locks.get(worksheet_name)
+        if lock is None:
+            lock_file = open(self._path(worksheet_name, "lock"), "a")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            lock = self._locks[worksheet_name] = [lock_file, 0]
+        lock[1] += 1
+        try:
+            yield
+        finally:
+            lock[1] -= 1
+            if not lock[1]:
+                del self._locks[worksheet_name]
+                fcntl.flock(lock[0], fcntl.LOCK_UN)
+                lock[0].close()
+
+    def _read_revision(self, worksheet_name):
+        """Returns (revision, downloaded at) of a worksheet, or None."""
+        try:
+            with open(self._path(worksheet_name, "revision")) as file:
+                revision, downloaded_at = file.read().split()
+        except (OSError, ValueError):
+            return None
+        return int(revision), float(downloaded_at)
+
+    def _replace(self, worksheet_name, suffix, data, mode="wb"):
+        """Writes a file atomically: readers see the old or new one."""
+        path = self._path(worksheet_name, suffix)
+        with open(f"{path}.{os.getpid()}.tmp", mode) as file:
+            file.write(data)
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+    def _store(self, worksheet_name, rows, downloaded_at):
+        """Writes a snapshot as the next revision (lock held)."""
+        current = self._read_revision(worksheet_name)
+        revision = current[0] + 1 if current else 1
+        # marshal: the fastest format for lists of str/int, and every
+        # process of the host runs the same Python
+        self._replace(
+            worksheet_name, "snapshot",
+            marshal.dumps((revision, [list(row) for row in rows])))
+        # The revision last, so it never points ahead of the snapshot
+        self._replace(
+            worksheet_name, "revision", f"{revision} {downloaded_at}", "w")
+        self._loaded[worksheet_name] = (revision, rows)
+
+    def get(self, worksheet_name):
+        """Returns the shared rows of a worksheet, or None if not fresh."""
+        current = self._read_revision(worksheet_name)
+        if current is None:
+            return None
+        revision, downloaded_at = current
+        if self.clock() - downloaded_at > self.ttl:
+            return None
+        loaded = self._loaded.get(worksheet_name)
+        if loaded is None or loaded[0] != revision:
+            snapshot_path = self._path(worksheet_name, "snapshot")
+            try:
+                with open(snapshot_path, "rb") as file:
+                    revision, rows = marshal.load(file)
+            except (OSError, EOFError, ValueError):
+                return None
+            loaded = self._loaded[worksheet_name] = (
+                revision, CompactRows.from_rows(rows))
+        return loaded[1]
+
+    def put(self, worksheet_name, rows):
+        """Shares a freshly downloaded snapshot with the other processes."""
+        with self.refreshing(worksheet_name):
+            self._store(worksheet_name, rows, self.clock())
+
+    def append_rows(self, worksheet_name, rows):
+        """Adds newly written rows to the shared snapshot, if fresh."""
+        with self.refreshing(worksheet_name):
+            cached_rows = self.get(worksheet_name)
+            if cached_rows is None:
+                return
+            cached_rows = cached_rows + [list(row) for row in rows]
+            self._store(
+                worksheet_name, cached_rows,
+                self._read_revision(worksheet_name)[1])
+
+    def invalidate(self, worksheet_name=None):
+        """Drops one snapshot, or all of them when no name is given."""
+        if worksheet_name is None:
+            names = {
+                name.rsplit(".", 1)[0] for name in os.listdir(self.directory)
+                if name.endswith(".revision")}
+        else:
+            names = {worksheet_name}
+        for name in names:
+            with self.refreshing(name):
+                self._loaded.pop(name, None)
+                current = self._read_revision(name)
+                if current is not None:
+                    # A new revision, never fresh: revisions must only
+                    # go up, or a process still holding an older
+                    # snapshot with the same number would take it as
+                    # current
+                    self._replace(name, "revision", f"{current[0] + 1} 0", "w")
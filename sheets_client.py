@@ -0,0 +1,135 @@
+"""
+Quota-aware calls to the Google Sheets API for the CommunityFinances App.
+
+Every gspread call of GoogleSheetsStorage goes through SheetsApiClient:
+
+    rate limiting  a token bucket for reads and one for writes
+                   (FINANCES_SHEETS_READS_PER_MINUTE and
+                   FINANCES_SHEETS_WRITES_PER_MINUTE), so a session
+                   waits a little instead of running into the quota.
+    retries        429 (quota exceeded) and 5xx answers are retried
+                   with exponential backoff and full jitter. Writes are
+                   only retried on 429, as a 5xx append may have landed.
+
+metrics counts the throttles, retries and failures. Identical reads are
+coalesced across the sessions of a host by the shared snapshot cache
+(see shared_cache.py): one session downloads a worksheet while the
+others wait for its snapshot, and count a "coalesced" read instead.
+"""
+from collections import Counter
+import random
+import threading
+import time
+
+
+DEFAULT_READS_PER_MINUTE = 60
+DEFAULT_WRITES_PER_MINUTE = 60
+# Requests that can be made at once after a quiet period
+DEFAULT_BURST = 10
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 1
+DEFAULT_MAX_DELAY = 32
+
+READ_RETRY_STATUSES = (429, 500, 502, 503, 504)
+WRITE_RETRY_STATUSES = (429,)
+
+
+def status_code(error):
+    """Returns the HTTP status of a gspread APIError, or None."""
+    return getattr(getattr(error, "response", None), "status_code", None)
+
+
+class TokenBucket:
+    """Allows rate calls per second on average, burst calls at once."""
+
+    def __init__(self, rate, burst=DEFAULT_BURST, clock=time.monotonic,
+                 sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = burst
+        self.updated_at = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes a token, waiting for one if the bucket is empty. Returns
+        the seconds waited.
+        """
+        waited = 0
+        with self._lock:
+            while True:
+                now = self.clock()
+                self.tokens = min(
+                    self.burst,
+                    self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+                self.sleep(delay)
+                waited += delay
+
+
+class SheetsApiClient:
+    """
+    Makes gspread calls with rate limiting and retries.
+    api_calls counts the requests made, by gspread method.
+    """
+
+    def __init__(self, reads_per_minute=DEFAULT_READS_PER_MINUTE,
+                 writes_per_minute=DEFAULT_WRITES_PER_MINUTE,
+                 max_retries=DEFAULT_MAX_RETRIES,
+                 base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY,
+                 clock=time.monotonic, sleep=time.sleep,
+                 jitter=random.random):
+        self.read_bucket = TokenBucket(reads_per_minute / 60, clock=clock,
+                                       sleep=sleep)
+        self.write_bucket = TokenBucket(writes_per_minute / 60, clock=clock,
+                                        sleep=sleep)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.jitter = jitter
+        self.api_calls = Counter()
+        self.metrics = Counter()
+
+    def read(self, method_name, function, *args, **kwargs):
+        """Calls a gspread read."""
+        return self._call(
+            method_name, self.read_bucket, READ_RETRY_STATUSES,
+            function, args, kwargs)
+
+    def write(self, method_name, function, *args, **kwargs):
+        """Calls a gspread write."""
+        return self._call(
+            method_name, self.write_bucket, WRITE_RETRY_STATUSES,
+            function, args, kwargs)
+
+    def _call(self, method_name, bucket, retry_statuses, function, args,
+              kwargs):
+        """Makes a request, retrying throttled and failed ones."""
+        attempt = 0
+        while True:
+            waited = bucket.acquire()
+            if waited:
+                self.metrics["throttled"] += 1
+                self.metrics["throttled_seconds"] += waited
+            self.api_calls[method_name] += 1
+            try:
+                return function(*args, **kwargs)
+            except Exception as error:
+                if (attempt >= self.max_retries or
+                        status_code(error) not in retry_statuses):
+                    self.metrics["failures"] += 1
+                    raise
+            # Full jitter: anywhere up to the exponential delay, so that
+            # sessions throttled together do not retry together
+            delay = self.jitter() * min(
+                self.max_delay, self.base_delay * 2 ** attempt)
+            self.metrics["retries"] += 1
+            self.sleep(delay)
+            attempt += 1
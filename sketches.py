@@ -0,0 +1,137 @@
+"""
+Streaming quantile sketches for the CommunityFinances App reports.
+
+QuantileSketch is a KLL sketch (Karnin, Lang and Liberty, "Optimal
+Quantile Approximation in Streams"): amounts are added one at a time
+(or in batches) and the sketch keeps a bounded sample of them, in
+levels. An item of level h stands for 2**h amounts. When a level is
+full it is sorted and every other item (from a random first one) moves
+up a level, so the memory stays in the hundreds of items however many
+amounts are added, and any quantile (the median, the 90th percentile)
+is read from those items without sorting all the rows.
+
+Sketches of different partitions (months, sessions) merge into the
+sketch of them all. Up to SKETCH_SIZE amounts are kept exactly; beyond
+that a quantile is off by about 1% of the ranks, never in its value
+(it is always one of the amounts added).
+"""
+import math
+import random
+
+
+# Capacity of the top level, which sets the accuracy (and the memory)
+SKETCH_SIZE = 128
+# Each level below the top holds this fraction of the one above it
+LEVEL_RATIO = 2 / 3
+
+
+class QuantileSketch:
+    """A mergeable KLL sketch of numbers (amounts in cents)."""
+
+    def __init__(self):
+        # Items of each level, level h standing for 2**h values each
+        self.levels = [[]]
+        # Values added, merged ones included
+        self.count = 0
+        # Items kept (at most self._max_size before a compaction)
+        self._size = 0
+        self._capacities = self._level_capacities(1)
+        self._max_size = sum(self._capacities)
+
+    @staticmethod
+    def _level_capacities(height):
+        """Returns the capacity of each of height levels."""
+        return [
+            int(math.ceil(SKETCH_SIZE * LEVEL_RATIO ** (height - h - 1))) + 1
+            for h in range(height)]
+
+    def add(self, value):
+        """Adds a value."""
+        self.levels[0].append(value)
+        self.count += 1
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def add_many(self, values):
+        """Adds values (any iterable) in one go."""
+        level = self.levels[0]
+        size = len(level)
+        level.extend(values)
+        self.count += len(level) - size
+        self._size += len(level) - size
+        if self._size >= self._max_size:
+            self._compress()
+
+    def merge(self, other):
+        """Adds the values of another sketch to this one."""
+        while len(self.levels) < len(other.levels):
+            self._grow()
+        for level, other_level in zip(self.levels, other.levels):
+            level.extend(other_level)
+        self.count += other.count
+        self._size += other._size
+        if self._size >= self._max_size:
+            self._compress()
+
+    def _grow(self):
+        """Adds a level on top (the lower levels get smaller)."""
+        self.levels.append([])
+        self._capacities = self._level_capacities(len(self.levels))
+        self._max_size = sum(self._capacities)
+
+    def _compress(self):
+        """
+        Compacts the lowest level over its capacity, again and again,
+        until the sketch holds fewer items than its levels can.
+        """
+        while self._size >= self._max_size:
+            for h, level in enumerate(self.levels):
+                if len(level) >= self._capacities[h]:
+                    break
+            if h + 1 == len(self.levels):
+                self._grow()
+            level.sort()
+            # An odd item out stays, so no weight is lost
+            kept = len(level) % 2
+            promoted = level[kept + random.getrandbits(1)::2]
+            self.levels[h + 1].extend(promoted)
+            self._size -= len(level) - kept - len(promoted)
+            del level[kept:]
+
+    def quantile(self, fraction):
+        """
+        Returns the value at a fraction (0.5: the median) of the values
+        added, the lowest one whose rank reaches it, or None if the
+        sketch is empty.
+        """
+        if not self.count:
+            return None
+        weighted = sorted(
+            (value, 1 << h)
+            for h, level in enumerate(self.levels) for value in level)
+        rank = fraction * self.count
+        seen = 0
+        for value, weight in weighted:
+            seen += weight
+            if seen >= rank:
+                return value
+        return weighted[-1][0]
+
+    def to_list(self):
+        """Returns the levels, as a list of lists (for JSON)."""
+        return [list(level) for level in self.levels]
+
+    @classmethod
+    def from_list(cls, levels):
+        """Reads a sketch back from the lists of to_list()."""
+        sketch = cls()
+        while len(sketch.levels) < len(levels):
+            sketch._grow()
+        for h, level in enumerate(levels):
+            sketch.levels[h].extend(level)
+            sketch.count += len(level) << h
+            sketch._size += len(level)
+        if sketch._size >= sketch._max_size:
+            sketch._compress()
+        return sketch
@@ -0,0 +1,643 @@
+"""
+Storage backends for the CommunityFinances App.
+
+The FinanceManager reads and writes worksheet rows through a storage
+object instead of talking to Google Sheets directly. Two backends are
+available and the FINANCES_STORAGE environment variable picks one:
+
+    sheets  (default) the 'my_finances' Google Sheet, through gspread.
+    sqlite  a local, indexed SQLite database (FINANCES_SQLITE_PATH).
+
+The Google Sheet is only opened (and gspread/google-auth only imported)
+the first time a worksheet is actually read or written, so starting the
+app and reading the instructions costs no API calls.
+
+Besides whole snapshots, backends read a range of data rows (get_rows)
+and a single column (get_column_values), so the "view all" pages only
+download the rows they show, and the rows of a single month
+(get_month_rows), so a monthly report does not download the whole year
+when supports_month_reads() (SQLite, or a Google Sheet partitioned by
+month, see GoogleSheetsStorage).
+
+Every backend returns rows the same way gspread's get_all_values() does:
+a list of lists of strings, header row first. create_storage() wraps the
+backend in a snapshot cache (see cache.py), tuned with FINANCES_CACHE_TTL
+(seconds) and FINANCES_CACHE_SIZE (number of worksheets), in the
+materialized monthly reports (see reports.py), in a background writer
+(see write_behind.py), in a write buffer that batches new rows (see
+write_buffer.py) and in a write-ahead journal that keeps new rows on
+disk until they are stored (see journal.py).
+"""
+from collections import Counter
+import os
+import sqlite3
+import tempfile
+
+from cache import (
+    CachedStorage, SnapshotCache, DEFAULT_TTL_SECONDS, DEFAULT_MAX_ENTRIES)
+from journal import DEFAULT_JOURNAL_DIR, JournaledStorage, WriteAheadJournal
+from reports import ReportingStorage
+from schema import (
+    AMOUNT_CENTS_COLUMN, MONTH_NAMES, REPORT_HEADER,
+    REPORTS_WORKSHEET, WORKSHEET_HEADERS)
+from shared_cache import SharedSnapshotCache, fcntl
+from sheets_client import (
+    SheetsApiClient, DEFAULT_READS_PER_MINUTE, DEFAULT_WRITES_PER_MINUTE)
+from write_behind import WriteBehindStorage
+from write_buffer import BufferedStorage, DEFAULT_MAX_ROWS, DEFAULT_MAX_SECONDS
+
+
+SCOPE = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive.file",
+    "https://www.googleapis.com/auth/drive"
+    ]
+
+SPREADSHEET_NAME = "my_finances"
+
+DEFAULT_SQLITE_PATH = "my_finances.db"
+
+DEFAULT_SHARED_CACHE_DIR = os.path.join(
+    tempfile.gettempdir(), f"{SPREADSHEET_NAME}-cache")
+
+
+def month_partition_name(worksheet_name, month):
+    """Title of the worksheet holding the rows of one month."""
+    return f"{worksheet_name}_{month.lower()}"
+
+
+class GoogleSheetsStorage:
+    """
+    Reads and appends rows in the 'my_finances' Google Sheet. The
+    spreadsheet is opened with open_spreadsheet() on first use. Every
+    gspread call goes through a quota-aware SheetsApiClient, whose
+    api_calls counts the Sheets API calls made, by gspread method.
+
+    Once "python3 migrate.py partition-months" has run, the rows of each
+    month live in a worksheet of their own (e.g. expenses_january) and
+    the main worksheet only keeps rows of no known month. A month is
+    then read on its own, and a whole worksheet with one batched read of
+    its partitions. Until then everything is read from the main
+    worksheet, as before.
+    """
+
+    def __init__(self, open_spreadsheet=None, client=None):
+        self.open_spreadsheet = open_spreadsheet or open_google_spreadsheet
+        self.client = client if client is not None else SheetsApiClient()
+        self._spreadsheet = None
+        # Worksheet handles by title, all looked up with a single call
+        self._worksheets = None
+
+    @property
+    def api_calls(self):
+        """Sheets API calls made, by gspread method."""
+        return self.client.api_calls
+
+    @property
+    def api_metrics(self):
+        """Throttles, retries, failures and coalesced reads."""
+        return self.client.metrics
+
+    @property
+    def spreadsheet(self):
+        """The gspread spreadsheet, opened on first access."""
+        if self._spreadsheet is None:
+            self._spreadsheet = self.client.read(
+                "open", self.open_spreadsheet)
+        return self._spreadsheet
+
+    def _all_worksheets(self):
+        """Returns the worksheet handles by title, listed once."""
+        if self._worksheets is None:
+            spreadsheet = self.spreadsheet
+            self._worksheets = {
+                worksheet.title: worksheet
+                for worksheet in self.client.read(
+                    "worksheets", spreadsheet.worksheets)}
+        return self._worksheets
+
+    def _worksheet(self, title):
+        """Returns the gspread worksheet with a given title."""
+        worksheets = self._all_worksheets()
+        if title not in worksheets:
+            # Not listed when the session started: ask for it by name
+            # (gspread raises WorksheetNotFound if it does not exist)
+            worksheets[title] = self.client.read(
+                "worksheet", self.spreadsheet.worksheet, title)
+        return worksheets[title]
+
+    def connect(self):
+        """Opens the spreadsheet and looks up all worksheets up front."""
+        self._all_worksheets()
+
+    def _partitions(self, worksheet_name):
+        """
+        Returns the titles of the month partitions of a worksheet, in
+        month order and followed by the main worksheet, or None when the
+        worksheet has not been partitioned.
+        """
+        worksheets = self._all_worksheets()
+        titles = [
+            month_partition_name(worksheet_name, month)
+            for month in MONTH_NAMES]
+        if all(title in worksheets for title in titles):
+            return titles + [worksheet_name]
+        return None
+
+    def supports_month_reads(self):
+        """Checks whether a month can be read without the whole sheet."""
+        return all(self._partitions(name) for name in WORKSHEET_HEADERS)
+
+    def _column_letter(self, worksheet_name, column_name):
+        """Returns the A1 letter of a worksheet column."""
+        return chr(ord("A") + WORKSHEET_HEADERS[worksheet_name].index(
+            column_name))
+
+    def _last_column_letter(self, worksheet_name):
+        """Returns the A1 letter of the last column of a worksheet."""
+        return self._column_letter(
+            worksheet_name, WORKSHEET_HEADERS[worksheet_name][-1])
+
+    def _batch_get(self, ranges):
+        """Reads several A1 ranges with a single API call."""
+        response = self.client.read(
+            "values_batch_get", self.spreadsheet.values_batch_get, ranges)
+        return [
+            value_range.get("values", [])
+            for value_range in response["valueRanges"]]
+
+    def _partition_sizes(self, partitions):
+        """Returns the number of data rows of each partition."""
+        return [
+            len(values) for values in self._batch_get(
+                [f"'{title}'!A2:A" for title in partitions])]
+
+    def _padded_rows(self, worksheet_name, rows):
+        """Pads rows to the header width, as get_all_values() does."""
+        width = len(WORKSHEET_HEADERS[worksheet_name])
+        return [list(row) + [""] * (width - len(row)) for row in rows]
+
+    def get_all_rows(self, worksheet_name):
+        """Gets all rows (header included) from a worksheet."""
+        partitions = self._partitions(worksheet_name)
+        if partitions is None:
+            worksheet = self._worksheet(worksheet_name)
+            return self.client.read(
+                "get_all_values", worksheet.get_all_values)
+        last_column = self._last_column_letter(worksheet_name)
+        rows = [list(WORKSHEET_HEADERS[worksheet_name])]
+        for values in self._batch_get(
+                [f"'{title}'!A2:{last_column}" for title in partitions]):
+            rows.extend(self._padded_rows(worksheet_name, values))
+        return rows
+
+    def get_month_rows(self, worksheet_name, month):
+        """Gets the data rows of one month (any case) of a worksheet."""
+        if self._partitions(worksheet_name) is None:
+            # Not partitioned yet: the whole worksheet, filtered here
+            return [
+                row for row in self.get_all_rows(worksheet_name)[1:]
+                if row and row[0].lower() == month.lower()]
+        worksheet = self._worksheet(
+            month_partition_name(worksheet_name, month))
+        return self.client.read(
+            "get_all_values", worksheet.get_all_values)[1:]
+
+    def get_rows(self, worksheet_name, start, count):
+        """
+        Gets count data rows, from data row number start (0 is the row
+        below the header), with a single range read (e.g. A2:E501).
+        """
+        last_column = self._last_column_letter(worksheet_name)
+        partitions = self._partitions(worksheet_name)
+        if partitions is None:
+            worksheet = self._worksheet(worksheet_name)
+            return [list(row) for row in self.client.read(
+                "get", worksheet.get,
+                f"A{start + 2}:{last_column}{start + count + 1}")]
+        # The part of each partition that falls within the rows asked for
+        ranges = []
+        first_row = 0
+        for title, size in zip(partitions, self._partition_sizes(partitions)):
+            low = max(start, first_row) - first_row
+            high = min(start + count, first_row + size) - first_row
+            if low < high:
+                ranges.append(
+                    f"'{title}'!A{low + 2}:{last_column}{high + 1}")
+            first_row += size
+        if not ranges:
+            return []
+        rows = []
+        for values in self._batch_get(ranges):
+            rows.extend(self._padded_rows(worksheet_name, values))
+        return rows
+
+    def get_column_values(self, worksheet_name, column_name):
+        """Gets the cells of one column for all data rows."""
+        partitions = self._partitions(worksheet_name)
+        if partitions is None:
+            worksheet = self._worksheet(worksheet_name)
+            column = WORKSHEET_HEADERS[worksheet_name].index(column_name) + 1
+            return self.client.read(
+                "col_values", worksheet.col_values, column)[1:]
+        column = self._column_letter(worksheet_name, column_name)
+        sizes = self._partition_sizes(partitions)
+        values = []
+        for size, cells in zip(sizes, self._batch_get(
+                [f"'{title}'!{column}2:{column}" for title in partitions])):
+            # Trailing empty cells are left out by the API
+            values.extend(row[0] if row else "" for row in cells)
+            values.extend([""] * (size - len(cells)))
+        return values
+
+    def append_row(self, worksheet_name, row):
+        """Appends a single row at the end of a worksheet."""
+        self.append_rows(worksheet_name, [row])
+
+    def append_rows(self, worksheet_name, rows):
+        """
+        Appends several rows with a single API call (one per month
+        partition, once the worksheet is partitioned).
+        """
+        partitions = self._partitions(worksheet_name)
+        rows_by_title = {}
+        for row in rows:
+            month = str(row[0]).lower() if row else ""
+            if partitions is not None and month in MONTH_NAMES:
+                title = month_partition_name(worksheet_name, month)
+            else:
+                title = worksheet_name
+            rows_by_title.setdefault(title, []).append(row)
+        for title, title_rows in rows_by_title.items():
+            worksheet = self._worksheet(title)
+            self.client.write(
+                "append_rows", worksheet.append_rows, title_rows)
+
+    def set_column_values(self, worksheet_name, column_name, values):
+        """
+        Writes a whole column with a single API call: the header cell
+        column_name, then values for the data rows, in order.
+        """
+        column = self._column_letter(worksheet_name, column_name)
+        partitions = self._partitions(worksheet_name)
+        if partitions is None:
+            worksheet = self._worksheet(worksheet_name)
+            self.client.write(
+                "update", worksheet.update,
+                values=[[column_name]] + [[value] for value in values],
+                range_name=f"{column}1:{column}{len(values) + 1}")
+            return
+        data = []
+        first_row = 0
+        for title, size in zip(partitions, self._partition_sizes(partitions)):
+            data.append({
+                "range": f"'{title}'!{column}1:{column}{size + 1}",
+                "values": [[column_name]] + [
+                    [value]
+                    for value in values[first_row:first_row + size]],
+            })
+            first_row += size
+        self.client.write(
+            "values_batch_update", self.spreadsheet.values_batch_update,
+            {"valueInputOption": "RAW", "data": data})
+
+    def _reports_worksheet(self, create=False):
+        """
+        Returns the reports worksheet, created (with its header row) if
+        create is True, or None if there is none. With create, one made
+        by an older version with fewer columns is widened first.
+        """
+        worksheets = self._all_worksheets()
+        worksheet = worksheets.get(REPORTS_WORKSHEET)
+        if create and worksheet is not None and \
+                worksheet.col_count < len(REPORT_HEADER):
+            self.client.write(
+                "add_cols", worksheet.add_cols,
+                len(REPORT_HEADER) - worksheet.col_count)
+            self.client.write(
+                "update", worksheet.update,
+                values=[REPORT_HEADER], range_name="A1")
+        if REPORTS_WORKSHEET not in worksheets and create:
+            try:
+                worksheet = self.client.write(
+                    "add_worksheet", self.spreadsheet.add_worksheet,
+                    title=REPORTS_WORKSHEET, rows=len(MONTH_NAMES) + 1,
+                    cols=len(REPORT_HEADER))
+            except Exception:
+                # Created by another session since this one looked
+                return self._worksheet(REPORTS_WORKSHEET)
+            self.client.write(
+                "update", worksheet.update,
+                values=[REPORT_HEADER], range_name="A1")
+            worksheets[REPORTS_WORKSHEET] = worksheet
+        return worksheets.get(REPORTS_WORKSHEET)
+
+    def _report_range(self, month):
+        """Returns the A1 range of the report row of a month."""
+        number = MONTH_NAMES.index(month.lower()) + 2
+        last_column = chr(ord("A") + len(REPORT_HEADER) - 1)
+        return f"A{number}:{last_column}{number}"
+
+    def get_report_row(self, month):
+        """Gets the materialized report row of a month, or None."""
+        worksheet = self._reports_worksheet()
+        if worksheet is None:
+            return None
+        values = self.client.read(
+            "get", worksheet.get, self._report_range(month))
+        if not values or not values[0] or not values[0][0]:
+            return None
+        return list(values[0])
+
+    def get_report_rows(self):
+        """Gets the materialized report rows of all months, in one call."""
+        worksheet = self._reports_worksheet()
+        if worksheet is None:
+            return []
+        last_column = chr(ord("A") + len(REPORT_HEADER) - 1)
+        values = self.client.read(
+            "get", worksheet.get, f"A2:{last_column}{len(MONTH_NAMES) + 1}")
+        return [list(row) for row in values if row and row[0]]
+
+    def set_report_rows(self, rows):
+        """Writes report rows, each at its month's row, in one call."""
+        self._reports_worksheet(create=True)
+        self.client.write(
+            "values_batch_update", self.spreadsheet.values_batch_update, {
+                "valueInputOption": "RAW",
+                "data": [
+                    {"range": f"'{REPORTS_WORKSHEET}'!"
+                              f"{self._report_range(row[0])}",
+                     "values": [row]}
+                    for row in rows],
+            })
+
+    def partition_by_month(self):
+        """
+        Moves the rows of each month of both worksheets to a worksheet of
+        their own (see the class docstring). Returns the rows moved.
+        """
+        moved = 0
+        for worksheet_name, header in WORKSHEET_HEADERS.items():
+            if self._partitions(worksheet_name) is not None:
+                continue
+            rows_by_month = {month: [] for month in MONTH_NAMES}
+            other_rows = []
+            for row in self.get_all_rows(worksheet_name)[1:]:
+                month = row[0].lower() if row else ""
+                rows_by_month.get(month, other_rows).append(row)
+
+            # The partitions first: until the last one exists, the main
+            # worksheet (still complete) is the one read
+            for month, month_rows in rows_by_month.items():
+                title = month_partition_name(worksheet_name, month)
+                worksheet = self._all_worksheets().get(title)
+                if worksheet is None:
+                    worksheet = self.client.write(
+                        "add_worksheet", self.spreadsheet.add_worksheet,
+                        title=title, rows=len(month_rows) + 1,
+                        cols=len(header))
+                    self._worksheets[title] = worksheet
+                else:
+                    # Left behind by an interrupted migration
+                    self.client.write("clear", worksheet.clear)
+                self.client.write(
+                    "update", worksheet.update,
+                    values=[list(header)] + month_rows, range_name="A1")
+                moved += len(month_rows)
+
+            # Only the rows of no known month stay in the main worksheet
+            worksheet = self._worksheet(worksheet_name)
+            self.client.write(
+                "batch_clear", worksheet.batch_clear,
+                [f"A2:{self._last_column_letter(worksheet_name)}"])
+            if other_rows:
+                self.client.write(
+                    "update", worksheet.update,
+                    values=other_rows, range_name="A2")
+        return moved
+
+
+class SQLiteStorage:
+    """
+    Keeps the incomes and expenses worksheets as tables of a local
+    SQLite database. Values are stored as the same strings written to
+    the Google Sheet, so reports give the same numbers on both backends.
+    """
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH):
+        self.path = path
+        # Also used by the write-behind thread, never at the same time
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        # No Sheets API calls are ever made by this backend
+        self.api_calls = Counter()
+        self.api_metrics = Counter()
+        self._create_tables()
+
+    def _create_tables(self):
+        """
+        Creates the worksheet tables and their month index, and adds the
+        columns missing from tables created by an older version.
+        """
+        with self.connection:
+            for worksheet_name, header in WORKSHEET_HEADERS.items():
+                columns = ", ".join(
+                    f"{column} {self._column_type(column)}"
+                    for column in header)
+                self.connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {worksheet_name} "
+                    f"(id INTEGER PRIMARY KEY AUTOINCREMENT, {columns})")
+                existing_columns = [
+                    info[1] for info in self.connection.execute(
+                        f"PRAGMA table_info({worksheet_name})")]
+                for column in header:
+                    if column not in existing_columns:
+                        self.connection.execute(
+                            f"ALTER TABLE {worksheet_name} ADD COLUMN "
+                            f"{column} {self._column_type(column)}")
+                # Reports filter rows by month
+                self.connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS {worksheet_name}_month "
+                    f"ON {worksheet_name} (month COLLATE NOCASE)")
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {REPORTS_WORKSHEET} "
+                f"(month TEXT PRIMARY KEY COLLATE NOCASE, "
+                f"{', '.join(REPORT_HEADER[1:])})")
+            existing_columns = [
+                info[1] for info in self.connection.execute(
+                    f"PRAGMA table_info({REPORTS_WORKSHEET})")]
+            for column in REPORT_HEADER:
+                if column not in existing_columns:
+                    self.connection.execute(
+                        f"ALTER TABLE {REPORTS_WORKSHEET} "
+                        f"ADD COLUMN {column}")
+
+    def _column_type(self, column):
+        """Returns the SQLite type of a worksheet column."""
+        return "INTEGER" if column == AMOUNT_CENTS_COLUMN else "TEXT"
+
+    def _header(self, worksheet_name):
+        """Returns the header row of a known worksheet."""
+        try:
+            return WORKSHEET_HEADERS[worksheet_name]
+        except KeyError:
+            raise ValueError(f"Unknown worksheet: {worksheet_name}")
+
+    def connect(self):
+        """The database is opened in __init__, nothing to do here."""
+
+    def get_all_rows(self, worksheet_name):
+        """Gets all rows (header included) from a worksheet table."""
+        header = self._header(worksheet_name)
+        cursor = self.connection.execute(
+            f"SELECT {', '.join(header)} FROM {worksheet_name} ORDER BY id")
+        return [list(header)] + [list(row) for row in cursor]
+
+    def supports_month_reads(self):
+        """Months are read with the month index of each table."""
+        return True
+
+    def get_month_rows(self, worksheet_name, month):
+        """Gets the data rows of one month (any case) of a worksheet."""
+        header = self._header(worksheet_name)
+        cursor = self.connection.execute(
+            f"SELECT {', '.join(header)} FROM {worksheet_name} "
+            f"WHERE month = ? COLLATE NOCASE ORDER BY id", (month,))
+        return [list(row) for row in cursor]
+
+    def get_rows(self, worksheet_name, start, count):
+        """Gets count data rows, from data row number start."""
+        header = self._header(worksheet_name)
+        cursor = self.connection.execute(
+            f"SELECT {', '.join(header)} FROM {worksheet_name} "
+            f"ORDER BY id LIMIT ? OFFSET ?", (count, start))
+        return [list(row) for row in cursor]
+
+    def get_column_values(self, worksheet_name, column_name):
+        """Gets the cells of one column for all data rows."""
+        if column_name not in self._header(worksheet_name):
+            raise ValueError(f"Unknown column: {column_name}")
+        return [
+            value for (value,) in self.connection.execute(
+                f"SELECT {column_name} FROM {worksheet_name} ORDER BY id")]
+
+    def append_row(self, worksheet_name, row):
+        """Inserts a single row at the end of a worksheet table."""
+        self.append_rows(worksheet_name, [row])
+
+    def append_rows(self, worksheet_name, rows):
+        """Inserts several rows in a single transaction."""
+        header = self._header(worksheet_name)
+        placeholders = ", ".join("?" for _ in header)
+        # Rows in an older layout leave the newer columns empty
+        values = [
+            list(row) + [None] * (len(header) - len(row)) for row in rows]
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT INTO {worksheet_name} ({', '.join(header)}) "
+                f"VALUES ({placeholders})", values)
+
+    def set_column_values(self, worksheet_name, column_name, values):
+        """Writes a whole column: values for the data rows, in order."""
+        if column_name not in self._header(worksheet_name):
+            raise ValueError(f"Unknown column: {column_name}")
+        row_ids = [
+            row_id for (row_id,) in self.connection.execute(
+                f"SELECT id FROM {worksheet_name} ORDER BY id")]
+        with self.connection:
+            self.connection.executemany(
+                f"UPDATE {worksheet_name} SET {column_name} = ? "
+                f"WHERE id = ?", list(zip(values, row_ids)))
+
+    def partition_by_month(self):
+        """Nothing to move: the month index already serves month reads."""
+        return 0
+
+    def get_report_row(self, month):
+        """Gets the materialized report row of a month, or None."""
+        row = self.connection.execute(
+            f"SELECT {', '.join(REPORT_HEADER)} FROM {REPORTS_WORKSHEET} "
+            f"WHERE month = ?", (month,)).fetchone()
+        return list(row) if row else None
+
+    def get_report_rows(self):
+        """Gets the materialized report rows of all months."""
+        return [
+            list(row) for row in self.connection.execute(
+                f"SELECT {', '.join(REPORT_HEADER)} "
+                f"FROM {REPORTS_WORKSHEET}")]
+
+    def set_report_rows(self, rows):
+        """Writes report rows, replacing those of the same months."""
+        placeholders = ", ".join("?" for _ in REPORT_HEADER)
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO {REPORTS_WORKSHEET} "
+                f"({', '.join(REPORT_HEADER)}) VALUES ({placeholders})",
+                rows)
+
+
+def open_google_spreadsheet():
+    """Authorizes with creds.json and opens the 'my_finances' sheet."""
+    # Imported here: loading gspread and google-auth is a large part of
+    # the start-up time, and the sqlite backend does not need them
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    creds = Credentials.from_service_account_file('creds.json')
+    scoped_creds = creds.with_scopes(SCOPE)
+    gspread_client = gspread.authorize(scoped_creds)
+    return gspread_client.open(SPREADSHEET_NAME)
+
+
+def create_backend():
+    """Creates the storage backend selected by FINANCES_STORAGE."""
+    backend = os.environ.get("FINANCES_STORAGE", "sheets").strip().lower()
+    if backend == "sqlite":
+        path = os.environ.get("FINANCES_SQLITE_PATH", DEFAULT_SQLITE_PATH)
+        return SQLiteStorage(path)
+    if backend == "sheets":
+        return GoogleSheetsStorage(client=SheetsApiClient(
+            reads_per_minute=float(os.environ.get(
+                "FINANCES_SHEETS_READS_PER_MINUTE",
+                DEFAULT_READS_PER_MINUTE)),
+            writes_per_minute=float(os.environ.get(
+                "FINANCES_SHEETS_WRITES_PER_MINUTE",
+                DEFAULT_WRITES_PER_MINUTE))))
+    raise ValueError(
+        f"Unknown FINANCES_STORAGE '{backend}'. Use 'sheets' or 'sqlite'.")
+
+
+def create_storage(backend=None):
+    """
+    Creates the configured storage backend (or wraps the one given)
+    behind a snapshot cache, the materialized monthly reports, a
+    background writer, a write buffer and a write-ahead journal.
+    """
+    if backend is None:
+        backend = create_backend()
+    ttl = float(os.environ.get("FINANCES_CACHE_TTL", DEFAULT_TTL_SECONDS))
+    shared_cache_dir = os.environ.get(
+        "FINANCES_SHARED_CACHE_DIR", DEFAULT_SHARED_CACHE_DIR)
+    cache = None
+    if (isinstance(backend, GoogleSheetsStorage) and shared_cache_dir and
+            fcntl is not None):
+        try:
+            # One download per TTL window for all the sessions of the host
+            cache = SharedSnapshotCache(shared_cache_dir, ttl=ttl)
+        except PermissionError:
+            # Someone else's folder: its snapshots cannot be trusted
+            pass
+    if cache is None:
+        cache = SnapshotCache(
+            ttl=ttl, max_entries=int(
+                os.environ.get("FINANCES_CACHE_SIZE", DEFAULT_MAX_ENTRIES)))
+    buffered_storage = BufferedStorage(
+        WriteBehindStorage(
+            ReportingStorage(CachedStorage(backend, cache))),
+        max_rows=int(os.environ.get("FINANCES_BUFFER_ROWS", DEFAULT_MAX_ROWS)),
+        max_seconds=float(
+            os.environ.get("FINANCES_BUFFER_SECONDS", DEFAULT_MAX_SECONDS)))
+    journal = WriteAheadJournal(
+        os.environ.get("FINANCES_JOURNAL_DIR", DEFAULT_JOURNAL_DIR))
+    return JournaledStorage(buffered_storage, journal)
@@ -0,0 +1,105 @@
+"""
+Base class of the storage wrappers of the CommunityFinances App.
+
+create_storage() stacks several wrappers on top of the storage backend
+(snapshot cache, materialized reports, background writer, write buffer,
+write-ahead journal). Each of them has the same interface as a backend
+and only changes a few calls: StorageWrapper hands every other call on
+to the storage it wraps, so a wrapper only defines the calls it changes.
+"""
+
+
+class StorageWrapper:
+    """Hands every storage call on to the wrapped storage."""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    @property
+    def api_calls(self):
+        """Sheets API calls made by the storage backend."""
+        return self.storage.api_calls
+
+    @property
+    def api_metrics(self):
+        """Throttles and retries of the storage backend."""
+        return self.storage.api_metrics
+
+    def connect(self):
+        """Connects the storage backend."""
+        self.storage.connect()
+
+    def get_all_rows(self, worksheet_name):
+        """Gets all rows of a worksheet."""
+        return self.storage.get_all_rows(worksheet_name)
+
+    def supports_month_reads(self):
+        """Checks whether the storage backend reads single months."""
+        return self.storage.supports_month_reads()
+
+    def get_month_rows(self, worksheet_name, month):
+        """Gets the data rows of one month of a worksheet."""
+        return self.storage.get_month_rows(worksheet_name, month)
+
+    def get_rows(self, worksheet_name, start, count):
+        """Gets count data rows, from data row number start."""
+        return self.storage.get_rows(worksheet_name, start, count)
+
+    def get_column_values(self, worksheet_name, column_name):
+        """Gets the cells of one column for all data rows."""
+        return self.storage.get_column_values(worksheet_name, column_name)
+
+    def append_row(self, worksheet_name, row):
+        """Appends a row, as a batch of one (see append_rows)."""
+        self.append_rows(worksheet_name, [row])
+
+    def append_rows(self, worksheet_name, rows):
+        """Appends rows to a worksheet."""
+        self.storage.append_rows(worksheet_name, rows)
+
+    def set_column_values(self, worksheet_name, column_name, values):
+        """Writes a whole column of a worksheet."""
+        self.storage.set_column_values(worksheet_name, column_name, values)
+
+    def partition_by_month(self):
+        """Partitions the worksheets by month."""
+        return self.storage.partition_by_month()
+
+    def get_report_row(self, month):
+        """Gets the materialized report row of a month, or None."""
+        return self.storage.get_report_row(month)
+
+    def get_report_rows(self):
+        """Gets the materialized report rows of all months."""
+        return self.storage.get_report_rows()
+
+    def set_report_rows(self, rows):
+        """Writes materialized report rows."""
+        self.storage.set_report_rows(rows)
+
+    def get_report(self, month):
+        """Returns the materialized MonthSummary of a month, or None."""
+        return self.storage.get_report(month)
+
+    def get_reports(self):
+        """Returns the materialized MonthSummary objects by month."""
+        return self.storage.get_reports()
+
+    def get_month_summaries(self, months):
+        """Returns {month: MonthSummary} of some months (lowercase)."""
+        return self.storage.get_month_summaries(months)
+
+    def regenerate_reports(self):
+        """Rebuilds all monthly reports."""
+        return self.storage.regenerate_reports()
+
+    def flush(self):
+        """Hands all buffered rows over to be stored."""
+        self.storage.flush()
+
+    def drain(self, timeout=None):
+        """
+        Waits (at most timeout seconds) until every row is stored.
+        Returns True if every row is stored.
+        """
+        return self.storage.drain(timeout)
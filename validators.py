@@ -0,0 +1,86 @@
+"""
+Input validators for the CommunityFinances App.
+
+The rules for the month, the free text (source and description), the
+category and the amount of a new entry, without any prompting: each
+validator returns the normalized value or raises ValueError with the
+message to show. The data entry screens of run.py ask again until a
+value passes, and bulk_import.py rejects the row.
+"""
+import re
+
+from amounts import format_cents_for_display, parse_amount_input, to_cents
+from schema import CATEGORIES, MONTH_NAMES
+
+
+_LETTER = re.compile("[a-zA-Z]")
+
+
+def validate_month(value):
+    """Returns a full month name (e.g. january) in title case."""
+    month = value.strip().lower()
+    if month not in MONTH_NAMES:
+        raise ValueError("Invalid input: Enter a month name.")
+    return month.title()
+
+
+def validate_text(value, min_length=4, require_alpha=True):
+    """
+    Returns a source or description of at least min_length characters,
+    with letters (if require_alpha) and not all digits.
+    """
+    text = value.strip()
+    if len(text) < min_length or (
+            require_alpha and not _LETTER.search(text)):
+        raise ValueError(
+            f"Invalid input: Must be at least {min_length} characters, "
+            "contain letters, and not be all numbers.")
+    if text.isdigit():
+        raise ValueError("Invalid input: Cannot be entirely numeric.")
+    return text
+
+
+def validate_category(value):
+    """Returns one of CATEGORIES, in title case."""
+    category = value.strip().title()
+    if not category:
+        raise ValueError(
+            "Empty input: Please choose a category from the list.")
+    if category not in CATEGORIES:
+        raise ValueError(
+            "Invalid category. Please choose from the following: " +
+            ", ".join(CATEGORIES))
+    return category
+
+
+def validate_amount(value):
+    """
+    Returns a positive amount in EUR (float), typed in the European
+    (1.234,56) or US (1,234.56) format.
+    """
+    amount = value.strip()
+    if not amount:
+        raise ValueError("Empty amount: Please enter a positive amount.")
+    if amount.startswith("-"):
+        raise ValueError("Invalid amount: Amount must be positive.")
+    try:
+        return parse_amount_input(amount)
+    except ValueError:
+        raise ValueError(
+            "Invalid amount format. Use this format (e.g) 1.234,56"
+        ) from None
+
+
+def income_row(month, source, amount):
+    """Returns the stored incomes row of validated inputs."""
+    # The amount is stored twice: for display and in integer cents, the
+    # display one formatted from the cents so that both always agree
+    cents = to_cents(amount)
+    return [month, source, format_cents_for_display(cents), cents]
+
+
+def expense_row(month, category, description, amount):
+    """Returns the stored expenses row of validated inputs."""
+    cents = to_cents(amount)
+    return [month, category, description, format_cents_for_display(cents),
+            cents]
@@ -0,0 +1,269 @@
+"""
+Background (write-behind) writer for the CommunityFinances App.
+
+Rows handed to WriteBehindStorage are queued and written by a worker
+thread, so data entry never waits for the Sheets API. A write refused
+over the quota (429) is retried, with a delay that doubles after every
+failure (up to 30 seconds), at most DEFAULT_MAX_ATTEMPTS times. Any
+other failure may come after the rows were stored (a 5xx, a network
+error), so it is not retried, as in sheets_client.py. A batch that
+fails is given up on: its rows stay in the write-ahead journal, and the
+next session stores the ones whose entry_id is not in the sheet. The
+batches after it are written as usual.
+
+Reads include the rows not written yet, so a session always sees its
+own entries, and never wait for the worker. drain() waits (with a
+timeout) until every batch is written or given up on.
+"""
+import queue
+import threading
+import time
+
+from aggregates import summaries_with_rows
+from rowstore import ChainedRows
+from schema import WORKSHEET_HEADERS
+from sheets_client import WRITE_RETRY_STATUSES, status_code
+from storage_wrapper import StorageWrapper
+
+
+DEFAULT_MAX_BATCHES = 100
+DEFAULT_RETRY_DELAY = 0.5
+DEFAULT_MAX_RETRY_DELAY = 30
+DEFAULT_MAX_ATTEMPTS = 5
+# How long a column write or migration waits for the queued rows
+DEFAULT_DRAIN_TIMEOUT = 60
+
+
+class WriteBehindStorage(StorageWrapper):
+    """
+    Wraps a storage backend and writes appended rows from a background
+    thread. Every call into the wrapped storage holds _storage_lock, so
+    the backend (and the snapshot cache) is never used by two threads
+    at once, and a batch leaves the queue in the same step as it is
+    written (it is never seen twice, nor missed, by a read). The report
+    rows are only used below it (by ReportingStorage), so the calls it
+    inherits for them take no lock.
+    """
+
+    def __init__(self, storage, max_batches=DEFAULT_MAX_BATCHES,
+                 retry_delay=DEFAULT_RETRY_DELAY,
+                 max_retry_delay=DEFAULT_MAX_RETRY_DELAY,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 drain_timeout=DEFAULT_DRAIN_TIMEOUT, sleep=time.sleep):
+        super().__init__(storage)
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_attempts = max_attempts
+        self.drain_timeout = drain_timeout
+        self.sleep = sleep
+        # Batches waiting for the worker; put() blocks when it is full
+        self._queue = queue.Queue(maxsize=max_batches)
+        # (worksheet name, rows) not written yet, in queue order
+        self._unwritten = []
+        # The unwritten batches given up on (their rows are journaled)
+        self._failed = []
+        self._unwritten_changed = threading.Condition()
+        self._storage_lock = threading.Lock()
+        self._worker = None
+        # Last error of a write that failed
+        self.last_error = None
+
+    def connect(self):
+        """Connects the wrapped storage backend."""
+        with self._storage_lock:
+            self.storage.connect()
+
+    def _unwritten_rows(self, worksheet_name):
+        """Returns the queued rows of a worksheet."""
+        with self._unwritten_changed:
+            return [
+                row for name, rows in self._unwritten
+                if name == worksheet_name for row in rows]
+
+    def get_all_rows(self, worksheet_name):
+        """Gets all stored rows of a worksheet followed by queued ones."""
+        with self._storage_lock:
+            rows = self.storage.get_all_rows(worksheet_name)
+            unwritten_rows = self._unwritten_rows(worksheet_name)
+        if unwritten_rows:
+            return ChainedRows(rows, unwritten_rows)
+        return rows
+
+    def supports_month_reads(self):
+        """Checks whether the wrapped backend reads single months."""
+        with self._storage_lock:
+            return self.storage.supports_month_reads()
+
+    def get_month_rows(self, worksheet_name, month):
+        """Gets the stored rows of one month followed by queued ones."""
+        with self._storage_lock:
+            rows = self.storage.get_month_rows(worksheet_name, month)
+            unwritten_rows = self._unwritten_rows(worksheet_name)
+        return rows + [
+            row for row in unwritten_rows
+            if row and str(row[0]).lower() == month.lower()]
+
+    def get_rows(self, worksheet_name, start, count):
+        """
+        Gets count data rows, from data row number start, of the stored
+        rows followed by the queued ones.
+        """
+        with self._storage_lock:
+            rows = self.storage.get_rows(worksheet_name, start, count)
+            unwritten_rows = self._unwritten_rows(worksheet_name)
+            if len(rows) == count or not unwritten_rows:
+                return rows
+            # The stored rows end before this range: where, exactly?
+            if rows:
+                stored_count = start + len(rows)
+            else:
+                stored_count = len(self.storage.get_column_values(
+                    worksheet_name, WORKSHEET_HEADERS[worksheet_name][0]))
+        first = max(start - stored_count, 0)
+        return rows + unwritten_rows[first:first + count - len(rows)]
+
+    def get_column_values(self, worksheet_name, column_name):
+        """Gets the cells of one column, stored ones then queued ones."""
+        position = WORKSHEET_HEADERS[worksheet_name].index(column_name)
+        with self._storage_lock:
+            values = self.storage.get_column_values(
+                worksheet_name, column_name)
+            unwritten_rows = self._unwritten_rows(worksheet_name)
+        return values + [
+            row[position] if len(row) > position else ""
+            for row in unwritten_rows]
+
+    def append_rows(self, worksheet_name, rows):
+        """
+        Queues rows to be written by the worker thread and returns
+        straight away (unless the queue is full).
+        """
+        batch = (worksheet_name, [list(row) for row in rows])
+        with self._unwritten_changed:
+            self._unwritten.append(batch)
+        self._start_worker()
+        self._queue.put(batch)
+
+    def _require_drained(self):
+        """
+        Waits (at most drain_timeout seconds) until every queued row is
+        written. Raises RuntimeError if some are not.
+        """
+        if not self.drain(self.drain_timeout):
+            raise RuntimeError(
+                f"{self.unwritten_row_count()} row(s) could not be "
+                f"stored yet: {self.last_error}")
+
+    def set_column_values(self, worksheet_name, column_name, values):
+        """Writes a whole column, once all queued rows are written."""
+        self._require_drained()
+        with self._storage_lock:
+            self.storage.set_column_values(worksheet_name, column_name, values)
+
+    def partition_by_month(self):
+        """Partitions the worksheets, once all queued rows are written."""
+        self._require_drained()
+        with self._storage_lock:
+            return self.storage.partition_by_month()
+
+    def get_report(self, month):
+        """
+        Returns the materialized MonthSummary of a month, or None if
+        the month has queued rows (the report does not count them yet).
+        """
+        with self._storage_lock:
+            with self._unwritten_changed:
+                if any(row and str(row[0]).lower() == month.lower()
+                       for _, rows in self._unwritten for row in rows):
+                    return None
+            return self.storage.get_report(month)
+
+    def get_reports(self):
+        """
+        Returns the materialized MonthSummary objects by month, but for
+        the months with queued rows.
+        """
+        with self._storage_lock:
+            reports = self.storage.get_reports()
+            with self._unwritten_changed:
+                for _, rows in self._unwritten:
+                    for row in rows:
+                        if row:
+                            reports.pop(str(row[0]).lower(), None)
+        return reports
+
+    def get_month_summaries(self, months):
+        """
+        Returns {month: MonthSummary} of some months (lowercase names),
+        the queued rows included.
+        """
+        with self._storage_lock:
+            return summaries_with_rows(
+                self.storage.get_month_summaries(months),
+                self._unwritten_rows("incomes"),
+                self._unwritten_rows("expenses"))
+
+    def regenerate_reports(self):
+        """Rebuilds all monthly reports, once queued rows are written."""
+        self._require_drained()
+        with self._storage_lock:
+            return self.storage.regenerate_reports()
+
+    def unwritten_row_count(self):
+        """Returns the number of rows not written yet."""
+        with self._unwritten_changed:
+            return sum(len(rows) for _, rows in self._unwritten)
+
+    def drain(self, timeout=None):
+        """
+        Waits until every queued batch is written or given up on, for at
+        most timeout seconds (None: no limit). Returns True if every
+        row is written.
+        """
+        with self._unwritten_changed:
+            self._unwritten_changed.wait_for(
+                lambda: len(self._unwritten) == len(self._failed), timeout)
+            return not self._unwritten
+
+    def _start_worker(self):
+        """Starts the worker thread on the first write."""
+        if self._worker is None:
+            # A daemon thread, so a drain timeout can still end the app
+            self._worker = threading.Thread(
+                target=self._write_batches, name="write-behind", daemon=True)
+            self._worker.start()
+
+    def _write_batches(self):
+        """Worker thread: writes the queued batches, in order."""
+        while True:
+            batch = self._queue.get()
+            self._write_batch(batch)
+            self._queue.task_done()
+
+    def _write_batch(self, batch):
+        """
+        Writes one batch, retrying 429 answers with a growing delay.
+        A batch that cannot be written is given up on (it stays unwritten).
+        """
+        worksheet_name, rows = batch
+        delay = self.retry_delay
+        attempt = 1
+        while True:
+            try:
+                with self._storage_lock:
+                    self.storage.append_rows(worksheet_name, rows)
+                    with self._unwritten_changed:
+                        self._unwritten.remove(batch)
+                        self._unwritten_changed.notify_all()
+                return
+            except Exception as error:
+                self.last_error = error
+                if (attempt >= self.max_attempts or
+                        status_code(error) not in WRITE_RETRY_STATUSES):
+                    with self._unwritten_changed:
+                        self._failed.append(batch)
+                        self._unwritten_changed.notify_all()
+                    return
+            self.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+            attempt += 1
@@ -0,0 +1,156 @@
+"""
+Buffered batch writer for the CommunityFinances App.
+
+New income/expense rows are collected in memory and written with one
+append_rows call per worksheet instead of one append_row call per entry.
+The buffer is flushed when it holds FINANCES_BUFFER_ROWS rows, when its
+oldest row is older than FINANCES_BUFFER_SECONDS, and whenever the app
+calls flush() (menu navigation and exit).
+"""
+import time
+
+from aggregates import summaries_with_rows
+from rowstore import ChainedRows
+from storage_wrapper import StorageWrapper
+
+
+DEFAULT_MAX_ROWS = 20
+DEFAULT_MAX_SECONDS = 30
+
+
+class BufferedStorage(StorageWrapper):
+    """
+    Wraps a storage backend and batches its writes. Reads include the
+    rows still waiting in the buffer, so a session always sees its own
+    entries in "view all" and in the reports.
+    """
+
+    def __init__(self, storage, max_rows=DEFAULT_MAX_ROWS,
+                 max_seconds=DEFAULT_MAX_SECONDS, clock=time.monotonic):
+        super().__init__(storage)
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self.clock = clock
+        # worksheet name -> rows not written yet, in entry order
+        self._pending = {}
+        self._oldest_entry_at = None
+
+    def pending_row_count(self):
+        """Returns the number of rows waiting to be written."""
+        return sum(len(rows) for rows in self._pending.values())
+
+    def _is_due(self):
+        """Checks whether the size or time threshold has been reached."""
+        if not self._pending:
+            return False
+        if self.pending_row_count() >= self.max_rows:
+            return True
+        return self.clock() - self._oldest_entry_at >= self.max_seconds
+
+    def get_all_rows(self, worksheet_name):
+        """Gets all stored rows of a worksheet followed by buffered ones."""
+        if self._is_due():
+            self.flush()
+        rows = self.storage.get_all_rows(worksheet_name)
+        pending_rows = self._pending.get(worksheet_name)
+        if pending_rows:
+            return ChainedRows(rows, pending_rows)
+        return rows
+
+    def get_month_rows(self, worksheet_name, month):
+        """Gets the stored rows of one month followed by buffered ones."""
+        rows = self.storage.get_month_rows(worksheet_name, month)
+        return rows + [
+            row for row in self._pending.get(worksheet_name, [])
+            if row and str(row[0]).lower() == month.lower()]
+
+    def get_rows(self, worksheet_name, start, count):
+        """Gets count data rows, once all buffered rows are stored."""
+        self.flush()
+        return self.storage.get_rows(worksheet_name, start, count)
+
+    def get_column_values(self, worksheet_name, column_name):
+        """Gets the cells of one column, once all buffered rows are stored."""
+        self.flush()
+        return self.storage.get_column_values(worksheet_name, column_name)
+
+    def append_rows(self, worksheet_name, rows):
+        """
+        Buffers rows, flushing the buffer if a threshold is reached (a
+        large batch goes out whole, in one call).
+        """
+        if not rows:
+            return
+        if not self._pending:
+            self._oldest_entry_at = self.clock()
+        self._pending.setdefault(worksheet_name, []).extend(
+            list(row) for row in rows)
+        if self._is_due():
+            self.flush()
+
+    def set_column_values(self, worksheet_name, column_name, values):
+        """Writes a whole column, once all buffered rows are stored."""
+        self.flush()
+        self.storage.set_column_values(worksheet_name, column_name, values)
+
+    def drain(self, timeout=None):
+        """
+        Hands all buffered rows over and waits (at most timeout seconds)
+        until the background writer has stored them. Returns True if
+        every row is stored.
+        """
+        self.flush()
+        return self.storage.drain(timeout)
+
+    def partition_by_month(self):
+        """Partitions the worksheets, once all buffered rows are stored."""
+        self.flush()
+        return self.storage.partition_by_month()
+
+    def get_report(self, month):
+        """
+        Returns the materialized MonthSummary of a month, or None if
+        the month has buffered rows (the report does not count them).
+        """
+        for rows in self._pending.values():
+            if any(row and str(row[0]).lower() == month.lower()
+                   for row in rows):
+                return None
+        return self.storage.get_report(month)
+
+    def get_reports(self):
+        """
+        Returns the materialized MonthSummary objects by month, but for
+        the months with buffered rows.
+        """
+        reports = self.storage.get_reports()
+        for rows in self._pending.values():
+            for row in rows:
+                if row:
+                    reports.pop(str(row[0]).lower(), None)
+        return reports
+
+    def get_month_summaries(self, months):
+        """
+        Returns {month: MonthSummary} of some months (lowercase names),
+        the buffered rows included.
+        """
+        return summaries_with_rows(
+            self.storage.get_month_summaries(months),
+            self._pending.get("incomes", []),
+            self._pending.get("expenses", []))
+
+    def regenerate_reports(self):
+        """Rebuilds all monthly reports, once buffered rows are stored."""
+        self.flush()
+        return self.storage.regenerate_reports()
+
+    def flush(self):
+        """Writes all buffered rows, one batched call per worksheet."""
+        while self._pending:
+            worksheet_name = next(iter(self._pending))
+            # Rows stay buffered if the write fails, so nothing is lost
+            self.storage.append_rows(
+                worksheet_name, self._pending[worksheet_name])
+            del self._pending[worksheet_name]
+        self._oldest_entry_at = None